@@ -146,53 +146,80 @@ class AdminHandlers:
 #=====================================================================================     
 
     USERS_PER_PAGE = 10
+    FILTERED_USERS_PER_PAGE = 10  # page size of the filtered view, kept as before paging moved to the DB
 
     async def view_users(self, update, context):
         cancel_restarted_message(context)
         """
-        Retrieve and display users with pagination (15 users per page).
+        Display users with pagination (USERS_PER_PAGE users per page).
+        Pages are fetched from the DB one at a time (see show_user_page).
         """
-        users = self.db_service.get_all_users()
+        context.user_data.pop('users', None)  # no longer kept in memory
+        return await self.show_user_page(update, context)
 
-        if not users:
-            await update.message.reply_text("No users found.")
-            return await self.show_admin_menu(update, context)
-
-        context.user_data['users'] = users  # Store all users in context
-        context.user_data['current_page'] = 0  # Start from the first page
-
-        return await self.show_user_page(update, context, page=0)
-
-    async def show_user_page(self, update, context, page=0):
-        cancel_restarted_message(context)
+    async def _fetch_user_page(self, context, state_key, filters=None, after_id=None, before_id=None, limit=None):
         """
-        Displays a specific page of users.
+        Loads one page of users with keyset pagination and stores the cursors
+        (first/last user_id on the page) under context.user_data[state_key].
+        Returns the rows of the page (limit rows at most, default USERS_PER_PAGE).
         """
-        users = context.user_data.get('users', [])
-        total_users = len(users)
-        
-        if total_users == 0:
-            await update.message.reply_text("No users to display.")
-            return await self.show_admin_menu(update, context)
+        filters = filters or {}
+        rows, has_more = await self.db_service.get_users_page(
+            after_id=after_id,
+            before_id=before_id,
+            limit=limit or self.USERS_PER_PAGE,
+            **filters
+        )
+        if not rows:
+            return rows
 
-        start_index = page * self.USERS_PER_PAGE
-        end_index = min(start_index + self.USERS_PER_PAGE, total_users)
-        
-        page_users = users[start_index:end_index]
-        user_list_text = "\n".join([
+        if before_id is not None:
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = after_id is not None, has_more
+
+        context.user_data[state_key] = {
+            'first_id': rows[0][0],
+            'last_id': rows[-1][0],
+            'has_prev': has_prev,
+            'has_next': has_next,
+            'filters': filters,
+        }
+        return rows
+
+    def _user_page_markup(self, page_state, prev_data, next_data):
+        """
+        Previous/Next inline buttons for a page of users (only the ones that apply).
+        """
+        pagination_buttons = []
+        if page_state['has_prev']:
+            pagination_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=prev_data))
+        if page_state['has_next']:
+            pagination_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=next_data))
+        return InlineKeyboardMarkup([pagination_buttons]) if pagination_buttons else None
+
+    @staticmethod
+    def _format_users(page_users):
+        return "\n".join([
             f"ID: {u[0]} | Name: {u[1]} | 🌍 Country: {u[2]} | Role: {u[3]} | 📲 Telegram ID: {u[4]}\n-----------------------------------"
             for u in page_users
         ])
 
-        pagination_buttons = []
-        if start_index > 0:
-            pagination_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"prev_users"))
-        if end_index < total_users:
-            pagination_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"next_users"))
+    async def show_user_page(self, update, context, after_id=None, before_id=None):
+        cancel_restarted_message(context)
+        """
+        Displays the page of users after 'after_id' / before 'before_id'
+        (the first page if neither is given).
+        """
+        page_users = await self._fetch_user_page(context, 'users_page', after_id=after_id, before_id=before_id)
 
-        keyboard = [pagination_buttons] if pagination_buttons else []
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+        if not page_users:
+            message = update.callback_query.message if update.callback_query else update.message
+            await message.reply_text("No users to display." if update.callback_query else "No users found.")
+            return await self.show_admin_menu(update, context)
+
+        user_list_text = self._format_users(page_users)
+        reply_markup = self._user_page_markup(context.user_data['users_page'], "prev_users", "next_users")
         reply_markup_keyboard = ReplyKeyboardMarkup(
         [["⬅️ Back to User Management"]],
         resize_keyboard=True,
@@ -206,28 +233,27 @@ class AdminHandlers:
             await update.message.reply_text(user_list_text, reply_markup=reply_markup)
             await update.message.reply_text("Use the button below to go back.", reply_markup=reply_markup_keyboard)
 
-        context.user_data['current_page'] = page
         return HANDLE_USERS
 
     async def handle_pagination(self, update, context):
         cancel_restarted_message(context)
         """
-        Handles pagination for user list.
+        Handles pagination for user list, moving from the cursors of the current page.
         """
         query = update.callback_query
         action = query.data
 
-        current_page = context.user_data.get('current_page', 0)
-        
+        page_state = context.user_data.get('users_page')
+        if not page_state:
+            return await self.show_user_page(update, context)
+
         if action == "next_users":
-            new_page = current_page + 1
+            return await self.show_user_page(update, context, after_id=page_state['last_id'])
         elif action == "prev_users":
-            new_page = max(0, current_page - 1)
+            return await self.show_user_page(update, context, before_id=page_state['first_id'])
         else:
             return  # Invalid action
 
-        return await self.show_user_page(update, context, new_page)
-
 #=====================================================================================
 #VIEW FILTERED USERS
 #=====================================================================================     
@@ -255,7 +281,7 @@ class AdminHandlers:
         user_input = update.message.text
         if user_input == back_user_man_text:
             return await self.show_user_management(update, context)
-        valid_columns = self.db_service.get_user_table_columns()
+        valid_columns = await self.db_service.get_user_table_columns()
     
         if user_input not in valid_columns:
             column_list = ", ".join(valid_columns)
@@ -293,50 +319,36 @@ class AdminHandlers:
         column = context.user_data.get('filter_column')
         value = user_input
 
-        users = self.db_service.get_users_filtered(column, value)
+        # ✅ Fetch only the first page; later pages are fetched by cursor
+        context.user_data.pop('filtered_users', None)
+        users = await self._fetch_user_page(
+            context, 'filtered_page', filters={'column': column, 'value': value}, limit=self.FILTERED_USERS_PER_PAGE
+        )
 
         if not users:
             await update.message.reply_text("❌ No users found matching the criteria.")
             return HANDLE_USERS
 
-        # ✅ Store data & initialize pagination
-        context.user_data['filtered_users'] = users
-        context.user_data['filtered_page'] = 0  
+        return await self.show_filtered_user_page(update, context, users)
 
-        return await self.show_filtered_user_page(update, context, page=0)
 
 
-
-    async def show_filtered_user_page(self, update, context, page=0):
+    async def show_filtered_user_page(self, update, context, page_users):
         """
-        Display a specific page of filtered users.
+        Display a page of filtered users (fetched by _fetch_user_page).
         """
-        users = context.user_data.get('filtered_users', [])
-        total_users = len(users)
-
-        if total_users == 0:
-            await update.message.reply_text("❌ No users to display.")
+        if not page_users:
+            message = update.callback_query.message if update.callback_query else update.message
+            await message.reply_text("❌ No users to display.")
             return HANDLE_USERS
 
-        USERS_PER_PAGE = 10  # ✅ Set pagination limit
-        start_index = page * USERS_PER_PAGE
-        end_index = min(start_index + USERS_PER_PAGE, total_users)
-
         # ✅ Format user data for display
-        page_users = users[start_index:end_index]
-        user_list_text = "\n".join([
-            f"ID: {u[0]} | Name: {u[1]} | 🌍 Country: {u[2]} | Role: {u[3]} | 📲 Telegram ID: {u[4]}\n-----------------------------------"
-            for u in page_users
-        ])
+        user_list_text = self._format_users(page_users)
 
         # ✅ Navigation Buttons (Only show if needed)
-        pagination_buttons = []
-        if start_index > 0:
-            pagination_buttons.append(InlineKeyboardButton("⬅️ Previous", callback_data="prev_filtered_users"))
-        if end_index < total_users:
-            pagination_buttons.append(InlineKeyboardButton("Next ➡️", callback_data="next_filtered_users"))
-
-        reply_markup = InlineKeyboardMarkup([pagination_buttons]) if pagination_buttons else None
+        reply_markup = self._user_page_markup(
+            context.user_data['filtered_page'], "prev_filtered_users", "next_filtered_users"
+        )
 
         # ✅ Edit message if callback_query, otherwise send a new message
         if update.callback_query:
@@ -345,30 +357,34 @@ class AdminHandlers:
         else:
             await update.message.reply_text(user_list_text, reply_markup=reply_markup)
 
-        # ✅ Store current page number
-        context.user_data['filtered_page'] = page
         return HANDLE_USERS
 
 
 
     async def handle_filtered_pagination(self, update, context):
         """
-        Handles Next/Previous pagination for filtered users.
+        Handles Next/Previous pagination for filtered users using the cursors
+        of the current page.
         """
         query = update.callback_query
         action = query.data
 
-        current_page = context.user_data.get('filtered_page', 0)  # ✅ Get current page number
+        page_state = context.user_data.get('filtered_page')  # ✅ Cursors of the current page
+        if not isinstance(page_state, dict):
+            await query.answer()
+            return HANDLE_USERS
 
         if action == "next_filtered_users":
-            new_page = current_page + 1
+            cursor = {'after_id': page_state['last_id']}
         elif action == "prev_filtered_users":
-            new_page = max(0, current_page - 1)
+            cursor = {'before_id': page_state['first_id']}
         else:
             return  # ❌ Invalid action
 
-        context.user_data['filtered_page'] = new_page  # ✅ Store new page number
-        return await self.show_filtered_user_page(update, context, new_page)
+        users = await self._fetch_user_page(
+            context, 'filtered_page', filters=page_state['filters'], limit=self.FILTERED_USERS_PER_PAGE, **cursor
+        )
+        return await self.show_filtered_user_page(update, context, users)
 
 
 
@@ -0,0 +1,59 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseService:
+    def __init__(self, db_service, offload=True):
+        """
+        Awaitable front-end for DatabaseService used by the async handlers.
+
+        Every public DatabaseService method is available here under the same
+        name and arguments, but returns a coroutine:
+
+            user_id, *_ = await self.db_service.check_user_exists(telegram_id)
+
+        :param db_service: The (pooled) DatabaseService instance to wrap.
+        :param offload: If True, queries run on a worker pool sized to the
+                        connection pool so they never block the event loop.
+                        If False, queries run inline (the old blocking behaviour),
+                        which can be handy when debugging.
+        """
+        self.db_service = db_service
+        self.offload = offload
+        # One worker per pooled connection: extra calls queue in the executor
+        # while their handlers stay suspended, instead of blocking the loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=db_service.pool.maxconn, thread_name_prefix="db"
+        ) if offload else None
+
+    def __getattr__(self, name):
+        attr = getattr(self.db_service, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+
+        return call
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Runs one DatabaseService call, off the event loop when offloading is enabled.
+        """
+        if not self.offload:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """
+        Stops the worker threads and closes the underlying connection pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.db_service.close()
@@ -1,60 +1,348 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import boto3
+import httpx
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from PresignedUrlCache import PresignedUrlCache
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Max keys in one DeleteObjects request
+DELETE_BATCH_SIZE = 1000
+
+
+class MultipartUpload:
+    def __init__(self, client, bucket, key, part_size):
+        """
+        Incremental S3 multipart upload. Data is fed in small chunks and at most
+        one part (part_size bytes) is held in memory before it is sent.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        self.bytes_received = 0
+        self._buffer = bytearray()
+        self._parts = []
+
+    def feed(self, chunk):
+        """
+        Buffers a chunk. Cheap, so it can run on the event loop.
+        """
+        self._buffer.extend(chunk)
+        self.bytes_received += len(chunk)
+
+    @property
+    def has_full_part(self):
+        return len(self._buffer) >= self.part_size
+
+    def upload_part(self, final=False):
+        """
+        Sends one buffered part (blocking). With final=True the remainder is sent
+        even if it is smaller than part_size.
+        """
+        size = len(self._buffer) if final else self.part_size
+        body = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=body
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def complete(self):
+        """
+        Sends the last part and assembles the object (blocking).
+        """
+        if self._buffer or not self._parts:
+            self.upload_part(final=True)
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self._parts}
+        )
+
+    def abort(self):
+        """
+        Discards the parts already uploaded so they don't keep costing storage.
+        """
+        self._buffer.clear()
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload of {self.key}: {e}")
+
 
 class BucketService:
+    def __init__(self, max_pool_connections=10, max_retries=3, retry_mode='standard', endpoint_url=None,
+                 url_cache_size=1024, url_min_remaining=900, upload_part_size=8 * 1024 * 1024,
+                 download_chunk_size=256 * 1024):
+        """
+        Wraps a single, lazily-built S3 client that is shared by every call,
+        so credentials, endpoint resolution and the HTTPS connection pool are reused.
+
+        :param max_pool_connections: Size of the client's HTTP connection pool.
+        :param max_retries: Max attempts for throttled / transient S3 errors.
+        :param retry_mode: botocore retry mode ('standard', 'adaptive' or 'legacy').
+        :param endpoint_url: Optional custom endpoint (e.g. a local S3 stand-in).
+        :param url_cache_size: Max presigned URLs kept in memory (0 disables the cache).
+        :param url_min_remaining: Seconds of lifetime a cached URL must still have to be reused.
+        :param upload_part_size: Bytes buffered per multipart part when streaming uploads
+                                 (this bounds the memory used by one upload).
+        :param download_chunk_size: Bytes read at a time from the Telegram download.
+        """
+        self.max_pool_connections = max_pool_connections
+        self.max_retries = max_retries
+        self.retry_mode = retry_mode
+        self.endpoint_url = endpoint_url
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.url_cache = PresignedUrlCache(url_cache_size, url_min_remaining) if url_cache_size else None
+        self.upload_part_size = upload_part_size
+        self.download_chunk_size = download_chunk_size
+        self._http = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds a BucketService from the optional s3_* keys of config.txt:
+
+            s3_max_pool_connections=10
+            s3_max_retries=3
+            s3_retry_mode=standard
+            s3_endpoint_url=http://localhost:9000
+            s3_url_cache_size=1024
+            s3_url_min_remaining=900
+            s3_upload_part_size=8388608
+        """
+        return cls(
+            max_pool_connections=int(config.get('s3_max_pool_connections', 10)),
+            max_retries=int(config.get('s3_max_retries', 3)),
+            retry_mode=config.get('s3_retry_mode', 'standard'),
+            endpoint_url=config.get('s3_endpoint_url') or None,
+            url_cache_size=int(config.get('s3_url_cache_size', 1024)),
+            url_min_remaining=int(config.get('s3_url_min_remaining', 900)),
+            upload_part_size=int(config.get('s3_upload_part_size', 8 * 1024 * 1024))
+        )
+
+    @property
+    def client(self):
+        """
+        The shared boto3 S3 client, created on first use.
+        boto3 clients are thread-safe, so one instance serves every handler.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = boto3.client(
+                        's3',
+                        endpoint_url=self.endpoint_url,
+                        config=Config(
+                            max_pool_connections=self.max_pool_connections,
+                            retries={'max_attempts': self.max_retries, 'mode': self.retry_mode}
+                        )
+                    )
+        return self._client
+
     @staticmethod
-    def addToBucket(file_obj, file_path_url):
-        # Extract key from full URL
+    def _parse_url(file_path_url):
+        """
+        Splits 'https://vesilebucket.s3.amazonaws.com/some/key.mp4'
+        into ('vesilebucket', 'some/key.mp4').
+        """
         parsed_url = urlparse(file_path_url)
         s3_key = parsed_url.path.lstrip('/')  # remove leading slash
         bucket = parsed_url.netloc.split('.')[0]  # vesilebucket from 'vesilebucket.s3.amazonaws.com'
+        return bucket, s3_key
+
+    def addToBucket(self, file_obj, file_path_url):
+        bucket, s3_key = self._parse_url(file_path_url)
 
-        s3 = boto3.client('s3')
-        s3.upload_fileobj(file_obj, bucket, s3_key)
+        self.client.upload_fileobj(file_obj, bucket, s3_key)
         print(f"Uploaded to: https://{bucket}.s3.amazonaws.com/{s3_key}")
 
-    
-    @staticmethod
-    def removeFromBucket(file_path_url):
-          # Parse URL to extract bucket name and key
-        parsed_url = urlparse(file_path_url)
-        s3_key = parsed_url.path.lstrip('/')
-        bucket = parsed_url.netloc.split('.')[0]
 
-        s3 = boto3.client('s3')
+    def start_multipart_upload(self, file_path_url):
+        """
+        Opens a MultipartUpload for the object at file_path_url (blocking).
+        """
+        bucket, s3_key = self._parse_url(file_path_url)
+        return MultipartUpload(self.client, bucket, s3_key, self.upload_part_size)
+
+    async def iter_telegram_file(self, telegram_file):
+        """
+        Yields the content of a telegram.File in chunks without loading it whole.
+        file_path is a download URL, or a local path when a local Bot API server is used.
+        """
+        source = telegram_file.file_path
+        if not source.startswith(('http://', 'https://')) and os.path.exists(source):
+            with open(source, 'rb') as f:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, self.download_chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            return
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(30.0))
+        async with self._http.stream("GET", source) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(self.download_chunk_size):
+                yield chunk
+
+    async def aclose(self):
+        """
+        Closes the HTTP client used for streaming downloads.
+        """
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def removeFromBucket(self, file_path_url):
+        bucket, s3_key = self._parse_url(file_path_url)
+
+        if self.url_cache:
+            self.url_cache.invalidate(bucket, s3_key)
         try:
-            s3.delete_object(Bucket=bucket, Key=s3_key)
+            self.client.delete_object(Bucket=bucket, Key=s3_key)
             print(f"Deleted: https://{bucket}.s3.amazonaws.com/{s3_key}")
             return True
         except Exception as e:
             print(f"Failed to delete: {e}")
             return False
-        
-    @staticmethod
-    def view_bucket_video(file_path_url, expiration=3600):
+
+    def removeManyFromBucket(self, file_path_urls):
+        """
+        Deletes many objects with multi-object DeleteObjects requests
+        (up to 1000 keys each, per bucket) instead of one request per key.
+        The requests run concurrently, up to max_pool_connections at a time.
+
+        :param file_path_urls: Full S3 URLs of the objects to delete.
+        :return: {file_path_url: error message} for the objects that could not be deleted.
+        """
+        by_bucket = {}
+        for file_path_url in file_path_urls:
+            bucket, s3_key = self._parse_url(file_path_url)
+            by_bucket.setdefault(bucket, {})[s3_key] = file_path_url
+
+        batches = []
+        for bucket, urls in by_bucket.items():
+            keys = list(urls)
+            for start in range(0, len(keys), DELETE_BATCH_SIZE):
+                batches.append((bucket, keys[start:start + DELETE_BATCH_SIZE]))
+        if not batches:
+            return {}
+
+        if len(batches) == 1:
+            results = [self._delete_batch(*batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(batches), self.max_pool_connections)) as executor:
+                results = list(executor.map(lambda batch: self._delete_batch(*batch), batches))
+
+        failures = {}
+        for (bucket, _), errors in zip(batches, results):
+            for s3_key, error in errors.items():
+                failures[by_bucket[bucket][s3_key]] = error
+        return failures
+
+    def _delete_batch(self, bucket, keys):
+        """
+        One DeleteObjects request. Returns {key: error message} for the keys
+        S3 did not delete (all of them if the request itself failed).
+        """
+        if self.url_cache:
+            for s3_key in keys:
+                self.url_cache.invalidate(bucket, s3_key)
+        try:
+            response = self.client.delete_objects(
+                Bucket=bucket,
+                Delete={'Objects': [{'Key': s3_key} for s3_key in keys], 'Quiet': True}
+            )
+        except Exception as e:
+            logger.error(f"Batch delete of {len(keys)} objects in {bucket} failed: {e}")
+            return {s3_key: str(e) for s3_key in keys}
+        errors = {error['Key']: error.get('Message', error.get('Code', 'unknown error'))
+                  for error in response.get('Errors', [])}
+        logger.info(f"Deleted {len(keys) - len(errors)} objects in {bucket} ({len(errors)} failed)")
+        return errors
+
+    def list_object_pages(self, file_path_url_prefix, page_size=1000):
+        """
+        Yields the objects under a URL prefix (blocking), one page at a time
+        in key order, as lists of (file_path_url, last_modified). The URLs
+        are built from the prefix, so they compare equal to the stored
+        file_path values.
+        """
+        bucket, key_prefix = self._parse_url(file_path_url_prefix)
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix, PaginationConfig={'PageSize': page_size}):
+            yield [
+                (file_path_url_prefix + item['Key'][len(key_prefix):], item['LastModified'])
+                for item in page.get('Contents', [])
+            ]
+
+    def get_object_body(self, file_path_url):
+        """
+        Opens the object for streaming reads (blocking). The caller reads
+        from and closes the returned body.
+        """
+        bucket, s3_key = self._parse_url(file_path_url)
+        return self.client.get_object(Bucket=bucket, Key=s3_key)['Body']
+
+    def object_exists(self, file_path_url):
+        """
+        True if the object exists, False if S3 answers 404/NoSuchKey.
+        Any other error (credentials, throttling, network) is raised, so
+        callers don't mistake an outage for a missing object.
+        """
+        bucket, s3_key = self._parse_url(file_path_url)
+        try:
+            self.client.head_object(Bucket=bucket, Key=s3_key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def view_bucket_video(self, file_path_url, expiration=3600):
         """
         Generate a presigned URL for viewing an S3 video.
+        A URL signed earlier is reused while it has enough lifetime left.
 
         :param file_path_url: Full S3 video URL
         :param expiration: URL expiration time in seconds (default: 1 hour)
         :return: Presigned URL string
         """
-        parsed_url = urlparse(file_path_url)
-        s3_key = parsed_url.path.lstrip('/')
-        bucket = parsed_url.netloc.split('.')[0]
-        
+        bucket, s3_key = self._parse_url(file_path_url)
+
+        if self.url_cache:
+            cached_url = self.url_cache.get(bucket, s3_key, expiration)
+            if cached_url:
+                return cached_url
 
-        s3 = boto3.client('s3')
         try:
-            presigned_url = s3.generate_presigned_url(
+            presigned_url = self.client.generate_presigned_url(
                 "get_object",
                 Params={
-                    'Bucket': bucket, 
+                    'Bucket': bucket,
                     'Key': s3_key
                     },
                 ExpiresIn=expiration
             )
+            if self.url_cache:
+                self.url_cache.put(bucket, s3_key, presigned_url, expiration)
             return presigned_url
         except Exception as e:
             print(f"Failed to generate presigned URL: {e}")
-            return None      
\ No newline at end of file
+            return None
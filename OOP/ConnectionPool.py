@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    def __init__(self, minconn=1, maxconn=10, checkout_timeout=10, health_check_interval=30, **connect_kwargs):
+        """
+        Thread-safe pool of PostgreSQL connections shared by every DatabaseService call.
+
+        :param minconn: Connections kept open once the pool is created.
+        :param maxconn: Upper bound of simultaneously checked-out connections.
+        :param checkout_timeout: Seconds to wait for a free connection before giving up.
+        :param health_check_interval: Connections idle for longer than this are
+                                      pinged with 'SELECT 1' before being handed out.
+        :param connect_kwargs: Passed straight to psycopg2.connect (dbname, user, ...).
+        """
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises instead of blocking when exhausted,
+        # so the semaphore makes callers queue for a free slot.
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}  # id(connection) -> monotonic timestamp
+
+    def _get_pool(self):
+        """
+        Lazily builds the underlying psycopg2 pool. If the database is down the
+        pool stays None and the next checkout tries again (transparent reconnect).
+        """
+        if self._pool is not None:
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, **self.connect_kwargs
+                    )
+                    logger.info(
+                        f"Connected to the PostgreSQL database successfully "
+                        f"(pool {self.minconn}-{self.maxconn})."
+                    )
+                except Exception as error:
+                    logger.error(f"Error connecting to the database: {error}")
+                    return None
+        return self._pool
+
+    def _is_healthy(self, connection):
+        """
+        Returns True if the connection can be handed out. Recently used
+        connections are trusted; idle ones are pinged.
+        """
+        if connection.closed:
+            return False
+        last_used = self._last_used.get(id(connection), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            connection.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as error:
+            logger.warning(f"Discarding broken database connection: {error}")
+            return False
+
+    def getconn(self):
+        """
+        Checks out a healthy connection, reconnecting if needed.
+        Returns None if no connection could be obtained.
+        """
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            logger.error("Timed out waiting for a free database connection.")
+            return None
+
+        try:
+            # One retry per possible pooled connection, plus one fresh connect.
+            for _ in range(self.maxconn + 1):
+                pool = self._get_pool()
+                if pool is None:
+                    break
+                try:
+                    connection = pool.getconn()
+                except Exception as error:
+                    logger.error(f"Error checking out database connection: {error}")
+                    break
+                try:
+                    healthy = self._is_healthy(connection)
+                except BaseException:
+                    # Unexpected failure of the check itself: drop the connection
+                    self._last_used.pop(id(connection), None)
+                    pool.putconn(connection, close=True)
+                    raise
+                if healthy:
+                    return connection
+                self._last_used.pop(id(connection), None)
+                pool.putconn(connection, close=True)
+        except BaseException:
+            # Never leak the slot, or the pool shrinks for good
+            self._slots.release()
+            raise
+
+        self._slots.release()
+        return None
+
+    def putconn(self, connection):
+        """
+        Returns a connection to the pool. Any transaction left open by the
+        caller is rolled back so the next user starts clean.
+        """
+        pool = self._pool
+        try:
+            if pool is None:
+                return
+            discard = bool(connection.closed)
+            if not discard and connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except Exception:
+                    discard = True
+            if discard:
+                self._last_used.pop(id(connection), None)
+            else:
+                self._last_used[id(connection)] = time.monotonic()
+            pool.putconn(connection, close=discard)
+        except Exception as error:
+            logger.error(f"Error returning database connection to the pool: {error}")
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager for a per-call checkout:
+
+            with pool.connection() as connection:
+                if not connection:
+                    ...
+        """
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            if connection is not None:
+                self.putconn(connection)
+
+    def closeall(self):
+        """
+        Closes every pooled connection (used on shutdown).
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
@@ -1,11 +1,172 @@
 import psycopg2
+import functools
 import logging
 import os
+import random
+import re
+import threading
+import time
+import uuid
 
 from BucketService import BucketService
+from ConnectionPool import ConnectionPool
+from UserProfileCache import UserProfileCache
 
 logger = logging.getLogger(__name__)
 
+# Idempotent DDL applied by DatabaseService.ensure_schema() on start-up, one
+# statement at a time. Indexes are built CONCURRENTLY so live tables keep
+# taking writes while they are created. A (statement, index name) entry only
+# runs once that index exists and is valid.
+SCHEMA_STATEMENTS = [
+    # Helper tables first: uploads need them, while the indexes below are only
+    # for speed and may take a while to build on large tables.
+    # Telegram file_ids of already-sent videos (see MediaCache)
+    """
+    CREATE TABLE IF NOT EXISTS public.media_cache (
+        media_key TEXT PRIMARY KEY,
+        file_id TEXT NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Last file number handed out per user and role, see allocate_video_file_path
+    """
+    CREATE TABLE IF NOT EXISTS public.video_file_counters (
+        user_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        last_number INTEGER NOT NULL,
+        PRIMARY KEY (user_id, role)
+    )
+    """,
+    # Content-addressed index of stored video objects: uploads with the same
+    # SHA-256 share one S3 object, ref_count = videos rows pointing at it
+    """
+    CREATE TABLE IF NOT EXISTS public.video_objects (
+        content_hash TEXT PRIMARY KEY,
+        file_path TEXT NOT NULL UNIQUE,
+        size_bytes BIGINT NOT NULL,
+        file_unique_id TEXT,
+        ref_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Translator videos a user skipped in the current request session
+    """
+    CREATE TABLE IF NOT EXISTS public.translator_video_skips (
+        user_id INTEGER NOT NULL,
+        video_id INTEGER NOT NULL,
+        skipped_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, video_id)
+    )
+    """,
+    # Set by StorageReconciler when the object is gone from the bucket;
+    # such entries are never used for deduplication
+    "ALTER TABLE public.video_objects ADD COLUMN IF NOT EXISTS missing_since TIMESTAMP",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS video_objects_file_unique_id_idx ON public.video_objects (file_unique_id)",
+    # Random order for sampling (see _sample_by_sort_key): a random key per
+    # video, given on insert; rows from before are filled in by ensure_schema
+    "ALTER TABLE public.videos ADD COLUMN IF NOT EXISTS sort_key DOUBLE PRECISION",
+    "ALTER TABLE public.videos ALTER COLUMN sort_key SET DEFAULT random()",
+    # Random translator video sampling: the translator videos of a language in sort_key order
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_translator_sort_idx
+    ON public.videos (language, sort_key)
+    WHERE video_reference_id IS NULL
+    """,
+    ("DROP INDEX CONCURRENTLY IF EXISTS public.videos_translator_lang_idx", 'videos_translator_sort_idx'),
+    # "Has this user already answered that translator video?" anti-join
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_user_reference_idx
+    ON public.videos (user_id, video_reference_id)
+    """,
+    # Voting: every video of a language in sort_key order (random sampling) ...
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_lang_sort_idx
+    ON public.videos (language, sort_key)
+    """,
+    ("DROP INDEX CONCURRENTLY IF EXISTS public.videos_lang_idx", 'videos_lang_sort_idx'),
+    # ... the "fewest votes first" ordering ...
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_lang_vote_count_idx
+    ON public.videos (language, (COALESCE(positive_scores, 0) + COALESCE(negative_scores, 0)), video_id)
+    """,
+    # ... and the "already voted by this user" anti-join. The index is unique so
+    # cast_vote can use ON CONFLICT; duplicate votes are merged first (see
+    # SCHEMA_PREPARE).
+    """
+    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS votes_user_video_key
+    ON public.votes (user_id, video_id)
+    """,
+    # The older non-unique index, once the unique one has replaced it
+    (
+        "DROP INDEX CONCURRENTLY IF EXISTS public.votes_user_video_idx",
+        'votes_user_video_key'
+    ),
+    # Sentence browsing: newest sentences of a language, one page at a time ...
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS sentences_lang_id_idx
+    ON public.sentences (sentence_language, sentence_id DESC)
+    """,
+    # ... and the translator sentences of a classroom
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_classroom_uploaded_idx
+    ON public.videos (classroom_id, uploaded_at DESC)
+    WHERE video_reference_id IS NULL
+    """,
+    # "My videos" windows: a user's videos, newest first
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_user_uploaded_idx
+    ON public.videos (user_id, uploaded_at DESC, video_id DESC)
+    """,
+    # Deleting a video checks whether other rows still use its object
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_file_path_idx ON public.videos (file_path)",
+    # Byte-order walk over file paths, matching S3 listing order (StorageReconciler)
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS videos_file_path_c_idx ON public.videos (file_path COLLATE "C")',
+]
+
+SCHEMA_INDEX_NAME = re.compile(r'INDEX CONCURRENTLY IF NOT EXISTS (\w+)')
+
+# index name -> DatabaseService method run (once) before the index is built,
+# for data that would keep it from being built
+SCHEMA_PREPARE = {
+    'votes_user_video_key': 'merge_duplicate_votes',
+}
+
+DEFAULT_VIDEO_BASE_URL = 'https://vesilebucket.s3.amazonaws.com/sign-language-videos/'
+
+# S3 folder and file name prefix of uploaded videos per role
+VIDEO_FOLDERS = {
+    'user': ('User', 'user_video'),
+    'translator': ('Translator', 'translator_video'),
+}
+
+VOTING_PRIORITIES = ('random', 'fewest_votes')
+
+# Seconds a cached sentence count is trusted (writes made through this class
+# invalidate it right away; the TTL covers changes made elsewhere)
+SENTENCE_COUNT_TTL = 60
+
+
+def with_connection(method):
+    """
+    Checks a pooled connection out for the duration of one DatabaseService call
+    and returns it afterwards. Inside the call it is available as self.connection.
+    Nested calls (e.g. delete_sentence_and_video -> delete_single_video) reuse
+    the connection already held by the current thread.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.connection is not None:
+            return method(self, *args, **kwargs)
+        with self.pool.connection() as connection:
+            self._local.connection = connection
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._local.connection = None
+    return wrapper
+
+
 class DatabaseService:
     
 
@@ -19,6 +180,15 @@ class DatabaseService:
                 db_password=your_password
                 db_host=your_host
                 db_port=your_port
+
+            Optional keys:
+
+                db_pool_min=1     # connections kept open
+                db_pool_max=10    # max concurrent connections
+                voting_priority=random   # or fewest_votes: least-voted videos first
+                user_cache_size=10000    # profiles kept by check_user_exists (0 disables)
+                user_cache_ttl=300       # seconds a cached profile is trusted
+                schema_lock_timeout=10s  # max wait for a lock per schema statement on start-up
             
             :param config_path: Path to the config file containing DB credentials.
             """
@@ -28,7 +198,37 @@ class DatabaseService:
             self.password = creds.get('db_password')
             self.host = creds.get('db_host')
             self.port = creds.get('db_port')
-            self.connection = self.connect_to_db()
+            self.config = creds
+            if creds.get('video_store', 's3').lower() == 'memory':
+                # In-process store (see RoutingVideoStore.from_config): new rows get
+                # memory:// paths unique to this run, so after a restart no row or
+                # dedupe lookup ever points at an object that was never in S3
+                self.video_base_url = f"memory://{uuid.uuid4().hex}/sign-language-videos/"
+                logger.warning(
+                    "video_store=memory: uploaded videos are lost on restart, but their rows stay "
+                    "in the database. Use a scratch database, not the production one."
+                )
+            else:
+                self.video_base_url = creds.get('video_base_url', DEFAULT_VIDEO_BASE_URL)
+            self.voting_priority = creds.get('voting_priority', 'random')
+            if self.voting_priority not in VOTING_PRIORITIES:
+                logger.error(f"Unknown voting_priority '{self.voting_priority}', using 'random'")
+                self.voting_priority = 'random'
+            self._local = threading.local()
+            self._votes_unique_index = False  # set by ensure_schema, see cast_vote
+            self.pool = self.connect_to_db()
+            self.ensure_schema()
+            # language -> counter bumped whenever a translator video is added,
+            # so per-user prefetch queues (UserHandlers) know they are stale
+            self.translator_video_versions = {}
+            # (language, classroom_id) -> (count, expires_at), see count_sentences
+            self._sentence_counts = {}
+            self._sentence_count_generation = 0  # bumped by _invalidate_sentence_counts
+            user_cache_size = int(creds.get('user_cache_size', 10000))
+            self.user_cache = UserProfileCache(
+                max_entries=user_cache_size,
+                ttl=int(creds.get('user_cache_ttl', 300))
+            ) if user_cache_size else None
     
     def _read_config_file(self, config_path):
         """
@@ -58,23 +258,149 @@ class DatabaseService:
 
     def connect_to_db(self):
         """
-        Establishes and returns a connection to the PostgreSQL database
-        using credentials loaded from the config file.
+        Creates the connection pool used by every DatabaseService method.
+        Pool bounds come from the optional db_pool_min / db_pool_max config keys.
+        Connections are opened lazily and re-opened if the database drops them.
+        """
+        return ConnectionPool(
+            minconn=int(self.config.get('db_pool_min', 1)),
+            maxconn=int(self.config.get('db_pool_max', 10)),
+            dbname=self.dbname,
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port
+        )
+
+    @property
+    def connection(self):
+        """
+        The connection checked out for the current call (see with_connection),
+        or None if the pool could not provide one.
+        """
+        return getattr(self._local, 'connection', None)
+
+    @with_connection
+    def ensure_schema(self):
+        """
+        Creates the indexes (and helper tables) the queries in this class rely on.
+        Every statement is idempotent, so this is safe to run on each start.
+
+        Statements run in autocommit mode, each in its own transaction: one that
+        fails (missing privilege, lock timeout, ...) is logged and skipped
+        without undoing the others. An index left invalid by an interrupted
+        concurrent build is dropped and built again.
+
+        :return: True if every statement succeeded.
         """
+        connection = self.connection
+        if not connection:
+            return False
+
+        ok = True
+        connection.autocommit = True
         try:
-            connection = psycopg2.connect(
-                dbname=self.dbname,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
-            logger.info("Connected to the PostgreSQL database successfully.")
-            return connection
+            cursor = connection.cursor()
+            # Don't queue behind long transactions for ever (that would also block
+            # every writer queued behind us); the next start tries again
+            cursor.execute("SET lock_timeout = %s", (self.config.get('schema_lock_timeout', '10s'),))
+            for statement in SCHEMA_STATEMENTS:
+                try:
+                    if isinstance(statement, tuple):
+                        statement, required_index = statement
+                        if not self._index_is_valid(cursor, required_index):
+                            continue
+                    index_name = SCHEMA_INDEX_NAME.search(statement)
+                    if index_name:
+                        index_name = index_name.group(1)
+                        self._drop_invalid_index(cursor, index_name)
+                        if index_name in SCHEMA_PREPARE and not self._index_is_valid(cursor, index_name):
+                            getattr(self, SCHEMA_PREPARE[index_name])()
+                    cursor.execute(statement)
+                except Exception as error:
+                    ok = False
+                    logger.error(f"Error applying schema statement {' '.join(statement.split())[:80]!r}: {error}")
+            cursor.execute("RESET lock_timeout")
+            if not self._backfill_sort_keys(cursor):
+                ok = False
+            self._votes_unique_index = self._index_is_valid(cursor, 'votes_user_video_key')
+            if not self._votes_unique_index:
+                logger.error("Index votes_user_video_key is missing, votes are cast with the slower locking path.")
+            cursor.close()
         except Exception as error:
-            logger.error(f"Error connecting to the database: {error}")
-            return None
-        
+            ok = False
+            logger.error(f"Error ensuring database schema: {error}")
+        finally:
+            connection.autocommit = False
+        return ok
+
+    @staticmethod
+    def _backfill_sort_keys(cursor, batch_size=5000):
+        """
+        Gives videos inserted before the sort_key column existed their random
+        key, batch_size rows per transaction (autocommit), so no long row
+        locks are held on the live table. Returns False on error.
+        """
+        try:
+            while True:
+                cursor.execute(
+                    """
+                    UPDATE public.videos
+                    SET sort_key = random()
+                    WHERE video_id IN (
+                        SELECT video_id FROM public.videos WHERE sort_key IS NULL LIMIT %s
+                    )
+                    """,
+                    (batch_size,)
+                )
+                if cursor.rowcount < batch_size:
+                    return True
+        except Exception as error:
+            logger.error(f"Error filling in video sort keys: {error}")
+            return False
+
+    @staticmethod
+    def _index_is_valid(cursor, index_name):
+        cursor.execute(
+            """
+            SELECT i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s
+            """,
+            (index_name,)
+        )
+        row = cursor.fetchone()
+        return bool(row and row[0])
+
+    @staticmethod
+    def _drop_invalid_index(cursor, index_name):
+        """
+        Drops the index if a failed CREATE INDEX CONCURRENTLY left it behind
+        invalid (IF NOT EXISTS would otherwise keep the useless index).
+        """
+        cursor.execute(
+            """
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s AND NOT i.indisvalid
+            """,
+            (index_name,)
+        )
+        if cursor.fetchone():
+            logger.warning(f"Rebuilding invalid index {index_name}")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS public.{index_name}")
+
+    def close(self):
+        """
+        Closes every pooled connection. Call on shutdown.
+        """
+        self.pool.closeall()
+
+    @with_connection
     def get_last_video_file_path(self, user_id):
         connection = self.connection
         if not connection:
@@ -98,12 +424,92 @@ class DatabaseService:
             logger.error(f"Error retrieving last video path: {e}")
             return None
 
+    @with_connection
+    def allocate_video_file_path(self, user_id, username, role='user'):
+        """
+        Hands out the S3 URL for a new upload of this user, e.g.
+        .../sign-language-videos/User/user_video_2_alice_3.mp4
+        (a memory:// location with video_store=memory, see video_base_url)
+
+        The number comes from the user's row in video_file_counters,
+        incremented atomically, so concurrent uploads never get the same
+        key. The first allocation seeds the counter from the highest number
+        among the user's existing videos. The base URL is the optional
+        'video_base_url' key of config.txt.
+
+        :param role: 'user' or 'translator'.
+        :return: The full location, or None on a database error.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        folder, prefix = VIDEO_FOLDERS.get(role.lower(), VIDEO_FOLDERS['user'])
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                UPDATE public.video_file_counters
+                SET last_number = last_number + 1
+                WHERE user_id = %s AND role = %s
+                RETURNING last_number
+                """,
+                (user_id, prefix)
+            )
+            row = cursor.fetchone()
+            if not row:
+                # First upload since the counters exist: continue after the
+                # user's existing files (a concurrent first upload takes the
+                # ON CONFLICT branch and gets the next number)
+                cursor.execute(
+                    """
+                    INSERT INTO public.video_file_counters (user_id, role, last_number)
+                    SELECT %s, %s, COALESCE(MAX(substring(file_path FROM %s)::INTEGER), 0) + 1
+                    FROM public.videos
+                    WHERE user_id = %s
+                    ON CONFLICT (user_id, role)
+                    DO UPDATE SET last_number = video_file_counters.last_number + 1
+                    RETURNING last_number
+                    """,
+                    (user_id, prefix, rf'/{prefix}_[^/]*_([0-9]+)\.mp4$', user_id)
+                )
+                row = cursor.fetchone()
+            connection.commit()
+            cursor.close()
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Error allocating video file path for user {user_id}: {e}")
+            return None
+
+        return f"{self.video_base_url.rstrip('/')}/{folder}/{prefix}_{user_id}_{username}_{row[0]}.mp4"
+
     
     
     def check_user_exists(self, telegram_id):
         """
         Checks if a user exists in the database by telegram_id or username 
         and returns the user's id, username, language, and role if they exist.
+        Known users are answered from user_cache without a DB round trip
+        (and without checking a connection out of the pool).
+        """
+        if not self.user_cache or not telegram_id:
+            return self._fetch_user_profile(telegram_id)
+
+        profile = self.user_cache.get(telegram_id)
+        if profile:
+            return profile
+        # Taken before the read: if the user is updated meanwhile, the profile
+        # read here may be the old one and is not cached
+        generation = self.user_cache.generation()
+        profile = self._fetch_user_profile(telegram_id)
+        if profile[0] is not None:
+            self.user_cache.put(telegram_id, profile, generation)
+        return profile
+
+    @with_connection
+    def _fetch_user_profile(self, telegram_id):
+        """
+        Reads (user_id, username, language, role, joined_classroom) of a user
+        from the database; all None if there is no such user.
         """
         connection = self.connection
         if not connection:
@@ -122,13 +528,14 @@ class DatabaseService:
                 if result:
                     cursor.close()
 
-                    return result[0], result[1], result[2], result[3], result[4]
+                    return (result[0], result[1], result[2], result[3], result[4])
             cursor.close()
             return None, None, None, None, None
         except Exception as error:
             logger.error(f"Error checking user in the database: {error}")
             return None, None, None, None, None
 
+    @with_connection
     def add_new_user(self, username, language, role, telegram_id):
         """
         Inserts a new user into the database after getting consent,
@@ -151,6 +558,8 @@ class DatabaseService:
             db_user_id = cursor.fetchone()[0]
             connection.commit()
             cursor.close()
+            if self.user_cache:
+                self.user_cache.invalidate(telegram_id)
             logger.info(
                 f"New user {username} added to the database with role {role} "
                 f"and telegram_id {telegram_id}."
@@ -167,6 +576,7 @@ class DatabaseService:
             logger.error(f"Error adding new user to the database: {error}")
             return None
 
+    @with_connection
     def get_user_language(self, user_id):
         """
         Retrieves user's language (country) from the database.
@@ -190,10 +600,25 @@ class DatabaseService:
             logger.error(f"Error getting user language from database: {error}")
             return None
 
-    def save_video_info(self, user_id, file_path, language, sentence=None, reference_id=None, sentence_id=None, classroom_id=None):
+    @with_connection
+    def save_video_info(self, user_id, file_path, language, sentence=None, reference_id=None, sentence_id=None, classroom_id=None,
+                        content_hash=None, size_bytes=None, file_unique_id=None, duplicate=False):
+        """
+        Inserts the 'videos' row of an upload. With content_hash the stored
+        object is registered in video_objects in the same transaction:
+
+        - duplicate=True: file_path is an existing object the upload was
+          deduplicated to, and its ref_count is raised. If that object was
+          released meanwhile (its last video deleted), nothing is saved and
+          False is returned: the caller must store the upload itself.
+        - otherwise file_path is a newly stored object. If an identical upload
+          registered its own object first, the row points at that one instead.
+
+        :return: The file_path the row points at, False (see above), or None on error.
+        """
         connection = self.connection
         if not connection:
-            return
+            return None
         try:
             if sentence and not sentence_id:
                 existing_id = self._find_sentence_id_if_exists(sentence, language)
@@ -216,8 +641,57 @@ class DatabaseService:
                     connection.commit()
                     cursor.close()
 
-            # 2) Insert row in 'videos' referencing that sentence_id
             cursor = connection.cursor()
+            if content_hash and duplicate:
+                # Row-locks the object, so it can't be released before this
+                # row is committed; no row means it was released already
+                cursor.execute(
+                    """
+                    UPDATE public.video_objects
+                    SET ref_count = ref_count + 1,
+                        file_unique_id = COALESCE(file_unique_id, %s)
+                    WHERE content_hash = %s AND file_path = %s AND missing_since IS NULL
+                    RETURNING 1
+                    """,
+                    (file_unique_id, content_hash, file_path)
+                )
+                if cursor.fetchone() is None:
+                    connection.rollback()
+                    cursor.close()
+                    logger.warning(f"Deduplication target {file_path} was deleted meanwhile, not saving the video")
+                    return False
+            elif content_hash:
+                # Registers the new object, or, if an identical upload got
+                # there first, references that one (the caller drops ours).
+                # An entry whose object went missing is taken over by this one.
+                # Objects of another store (see find_video_object) are left
+                # alone; the new object then stays untracked.
+                cursor.execute(
+                    """
+                    INSERT INTO public.video_objects (content_hash, file_path, size_bytes, file_unique_id, ref_count)
+                    VALUES (%s, %s, %s, %s, 1)
+                    ON CONFLICT (content_hash) DO UPDATE
+                    SET ref_count = CASE WHEN video_objects.missing_since IS NULL
+                                         THEN video_objects.ref_count + 1 ELSE 1 END,
+                        file_path = CASE WHEN video_objects.missing_since IS NULL
+                                         THEN video_objects.file_path ELSE EXCLUDED.file_path END,
+                        file_unique_id = COALESCE(video_objects.file_unique_id, EXCLUDED.file_unique_id),
+                        missing_since = NULL
+                    WHERE left(video_objects.file_path, %s) = %s
+                    RETURNING file_path
+                    """,
+                    (content_hash, file_path, size_bytes or 0, file_unique_id,
+                     len(self.video_base_url), self.video_base_url)
+                )
+                row = cursor.fetchone()
+                stored_path = row[0] if row else file_path
+                if not row:
+                    logger.info(f"Content of {file_path} is indexed under another store, not tracking it")
+                elif stored_path != file_path:
+                    logger.info(f"{file_path} duplicates {stored_path}, saving the video with the latter")
+                    file_path = stored_path
+
+            # 2) Insert row in 'videos' referencing that sentence_id
             if classroom_id:
                 cursor.execute(
                     """
@@ -238,18 +712,260 @@ class DatabaseService:
                 )
             connection.commit()
             cursor.close()
+            if reference_id is None:
+                self.translator_video_versions[language] = self.translator_video_versions.get(language, 0) + 1
+                self._invalidate_sentence_counts()
             logger.info(f"Video + sentence stored for user {user_id}")
+            return file_path
         except Exception as error:
+            connection.rollback()
             logger.error(f"Error saving video info: {error}")
+            return None
+
+    @with_connection
+    def find_video_object(self, content_hash=None, file_unique_id=None):
+        """
+        Looks up a stored video object by its SHA-256 or by the Telegram
+        file_unique_id it was first uploaded with. Only objects under the
+        current video_base_url are considered, so uploads are never
+        deduplicated onto another store's objects (e.g. memory:// ones), and
+        none that StorageReconciler found missing from the bucket.
+
+        :return: (file_path, content_hash, size_bytes), or None if unknown.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            if content_hash:
+                cursor.execute(
+                    """
+                    SELECT file_path, content_hash, size_bytes
+                    FROM public.video_objects
+                    WHERE content_hash = %s AND left(file_path, %s) = %s
+                      AND missing_since IS NULL
+                    """,
+                    (content_hash, len(self.video_base_url), self.video_base_url)
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT file_path, content_hash, size_bytes
+                    FROM public.video_objects
+                    WHERE file_unique_id = %s AND left(file_path, %s) = %s
+                      AND missing_since IS NULL
+                    LIMIT 1
+                    """,
+                    (file_unique_id, len(self.video_base_url), self.video_base_url)
+                )
+            row = cursor.fetchone()
+            cursor.close()
+            return row
+        except Exception as error:
+            logger.error(f"Error looking up video object: {error}")
+            return None
+
+    def _release_video_object(self, cursor, file_path):
+        """
+        Drops one reference to the object at file_path, after its 'videos'
+        row was deleted (same transaction, caller commits). Returns file_path
+        if nothing uses the object any more and it should be removed from the
+        bucket, else None. Objects uploaded before video_objects existed are
+        released once no 'videos' row points at them.
+        """
+        if not file_path:
+            return None
+        # Lock the object first: a deduplicated upload referencing it
+        # (save_video_info) either commits before this check or finds it gone
+        cursor.execute("SELECT 1 FROM public.video_objects WHERE file_path = %s FOR UPDATE", (file_path,))
+        cursor.execute(
+            """
+            UPDATE public.video_objects
+            SET ref_count = ref_count - 1
+            WHERE file_path = %s
+            RETURNING ref_count
+            """,
+            (file_path,)
+        )
+        row = cursor.fetchone()
+        if row and row[0] > 0:
+            return None
+        cursor.execute("SELECT 1 FROM public.videos WHERE file_path = %s LIMIT 1", (file_path,))
+        if cursor.fetchone():
+            return None
+        cursor.execute("DELETE FROM public.video_objects WHERE file_path = %s", (file_path,))
+        return file_path
+
+    def _release_video_objects(self, cursor, file_paths):
+        """
+        Bulk version of _release_video_object for deletes that removed many
+        'videos' rows at once (a user, a classroom). Recounts the references
+        of the given objects and returns the paths no row uses any more.
+        """
+        file_paths = list({path for path in file_paths if path})
+        if not file_paths:
+            return []
+        # Same locking as _release_video_object
+        cursor.execute(
+            "SELECT 1 FROM public.video_objects WHERE file_path = ANY(%s) ORDER BY file_path FOR UPDATE",
+            (file_paths,)
+        )
+        cursor.execute(
+            """
+            UPDATE public.video_objects vo
+            SET ref_count = (SELECT COUNT(*) FROM public.videos v WHERE v.file_path = vo.file_path)
+            WHERE vo.file_path = ANY(%s)
+            """,
+            (file_paths,)
+        )
+        cursor.execute(
+            """
+            SELECT p.file_path
+            FROM unnest(%s::TEXT[]) AS p(file_path)
+            WHERE NOT EXISTS (SELECT 1 FROM public.videos v WHERE v.file_path = p.file_path)
+            """,
+            (file_paths,)
+        )
+        orphaned_paths = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM public.video_objects WHERE file_path = ANY(%s)", (orphaned_paths,))
+        return orphaned_paths
+
+    @with_connection
+    def release_orphaned_objects(self, file_paths):
+        """
+        For StorageReconciler, before it deletes objects no 'videos' row
+        pointed at: drops their video_objects entries (so nothing is
+        deduplicated onto them any more) and returns the paths that are still
+        unreferenced. A path a new row started using in the meantime is left
+        out and must not be deleted. Returns None on error.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            orphaned_paths = self._release_video_objects(cursor, file_paths)
+            connection.commit()
+            cursor.close()
+            return orphaned_paths
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error releasing orphaned video objects: {error}")
+            return None
+
+    @with_connection
+    def mark_video_objects_missing(self, file_paths, min_age=0):
+        """
+        Flags the video_objects entries of objects StorageReconciler found
+        missing from the bucket, so find_video_object ignores them. Entries
+        younger than min_age seconds are skipped (their object may have been
+        stored after the bucket listing passed it).
+        Returns the number of entries flagged, or None on error.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                UPDATE public.video_objects
+                SET missing_since = COALESCE(missing_since, CURRENT_TIMESTAMP)
+                WHERE file_path = ANY(%s)
+                  AND created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                """,
+                (list(file_paths), float(min_age))
+            )
+            marked = cursor.rowcount
+            connection.commit()
+            cursor.close()
+            return marked
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error marking missing video objects: {error}")
+            return None
+
+    @with_connection
+    def get_file_paths_page(self, prefix, after=None, limit=1000):
+        """
+        The next distinct videos.file_path values starting with prefix, in
+        byte order (the order S3 lists keys in), for walking all paths in
+        bounded chunks.
+
+        :param after: Return the paths after this one (None starts at the beginning).
+        :return: List of paths, or None on a database error (so a caller
+                 never mistakes a failed query for "no paths").
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT DISTINCT file_path COLLATE "C"
+                FROM public.videos
+                WHERE file_path LIKE %s
+                  AND file_path COLLATE "C" > %s
+                ORDER BY 1
+                LIMIT %s
+                """,
+                (escaped + '%', after or '', limit)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+            return [row[0] for row in rows]
+        except Exception as error:
+            logger.error(f"Error listing video file paths: {error}")
+            return None
+
+    @with_connection
+    def get_dedupe_stats(self):
+        """
+        Storage saved by content-addressed deduplication (tracked objects only,
+        without those found missing from the bucket):
+        stored vs. logical (as if every upload had its own object) bytes.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*),
+                       COALESCE(SUM(ref_count), 0),
+                       COALESCE(SUM(size_bytes), 0),
+                       COALESCE(SUM(size_bytes * GREATEST(ref_count, 1)), 0)
+                FROM public.video_objects
+                WHERE missing_since IS NULL
+                """
+            )
+            objects, references, stored_bytes, logical_bytes = cursor.fetchone()
+            cursor.close()
+            return {
+                'objects': objects,
+                'references': references,
+                'stored_bytes': int(stored_bytes),
+                'logical_bytes': int(logical_bytes),
+                'saved_bytes': int(logical_bytes - stored_bytes),
+                'dedupe_ratio': float(logical_bytes) / float(stored_bytes) if stored_bytes else 1.0,
+            }
+        except Exception as error:
+            logger.error(f"Error computing dedupe stats: {error}")
+            return None
 
 
     
+    @with_connection
     def _find_sentence_id_if_exists(self, sentence, language):
         """
         Returns the existing sentence_id (int) if `sentence_content` + `language` 
         already exists in 'sentences'. Otherwise returns None.
         """
-        conn = self.connect_to_db()
+        conn = self.connection
         if not conn:
             return None
         try:
@@ -267,7 +983,6 @@ class DatabaseService:
             )
             row = cur.fetchone()
             cur.close()
-            conn.close()
             return row[0] if row else None
         except Exception as e:
             logger.error(f"Error in _find_sentence_id_if_exists: {e}")
@@ -275,61 +990,162 @@ class DatabaseService:
 
  
 
+    @with_connection
     def get_random_translator_video(self, user_language, context=None, classroom_id=None, exclude_ids=None):
         """
         Fetch a random translator video (video_reference_id IS NULL) for the
         given user_language. Optionally exclude a list of video IDs (exclude_ids),
-        and exclude videos already responded to or uploaded by the same user.
+        and exclude videos already responded to, skipped or uploaded by the same user.
+        See get_translator_video_batch for how the video is picked.
+        """
+        user_id = context.user_data.get('user_id') if context else None
+        rows = self.get_translator_video_batch(
+            user_language, user_id, classroom_id=classroom_id, exclude_ids=exclude_ids, limit=1
+        )
+        if not rows:
+            return None, None
+        video_id, file_path, sentence = rows[0]
+        if context:
+            context.user_data['current_translator_video_id'] = video_id
+        return file_path, sentence
+
+    @staticmethod
+    def _sample_by_sort_key(cursor, select, params, limit):
+        """
+        Runs 'select' (a SELECT ... FROM videos v ... WHERE ... without ORDER BY)
+        for up to 'limit' rows at a random point of the sort_key order: the
+        first rows at or after a random pivot, wrapping around to the lowest
+        keys if there are too few. With an index on (language, sort_key) only
+        the returned rows (and the ineligible ones between them) are read.
+
+        sort_key is random and independent of the video, so every eligible
+        video is equally likely to be picked and a batch holds unrelated
+        videos, not neighbouring ids.
+        """
+        pivot = random.random()
+        query = f"""
+            ({select} AND v.sort_key >= %s ORDER BY v.sort_key LIMIT %s)
+            UNION ALL
+            ({select} AND v.sort_key < %s ORDER BY v.sort_key LIMIT %s)
+            LIMIT %s
+        """
+        cursor.execute(query, list(params) + [pivot, limit] + list(params) + [pivot, limit, limit])
+        rows = cursor.fetchall()
+        random.shuffle(rows)
+        return rows
+
+    @with_connection
+    def get_translator_video_batch(self, user_language, user_id, classroom_id=None, exclude_ids=None, limit=20):
+        """
+        Returns up to 'limit' eligible translator videos at once as a random
+        sample of (video_id, file_path, sentence_content) tuples.
+
+        Eligible are translator videos of the language (and classroom) that the
+        user did not upload, answer or skip (see skip_translator_video). Skips
+        are joined on the server, so the query does not grow with the session;
+        exclude_ids is only for the few ids not recorded anywhere yet.
+
+        The sample is read from a random point of videos_translator_sort_idx
+        (see _sample_by_sort_key), so neither the eligible set is sorted nor
+        the whole language scanned, and every eligible video is equally likely.
+
+        Used to fill the per-user prefetch queue, so the eligibility query runs
+        once per batch instead of once per shown video.
         """
         connection = self.connection
         if not connection:
             logger.error("Failed to connect to database")
-            return None, None
-        
+            return []
+
         try:
             cursor = connection.cursor()
-            user_id = context.user_data.get('user_id') if context else None
-            
+
             exclude_clause = "AND v.video_id NOT IN %s" if exclude_ids else ""
             classroom_clause = "AND v.classroom_id = %s" if classroom_id else ""
-            query = f"""
+            # NOT EXISTS instead of NOT IN (subquery): NOT IN returns nothing
+            # as soon as the subquery yields a NULL.
+            select = f"""
                 SELECT v.video_id, v.file_path, s.sentence_content
                 FROM videos v
                 LEFT JOIN sentences s ON v.text_id = s.sentence_id
                 WHERE v.language = %s
                   AND v.user_id != %s
                   AND v.video_reference_id IS NULL
-                  AND v.video_id NOT IN (
-                      SELECT video_reference_id FROM videos WHERE user_id = %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM videos r
+                      WHERE r.user_id = %s AND r.video_reference_id = v.video_id
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM translator_video_skips k
+                      WHERE k.user_id = %s AND k.video_id = v.video_id
                   )
                   {classroom_clause}
                   {exclude_clause}
             """
-            
-            params = [user_language, user_id, user_id]
+
+            params = [user_language, user_id, user_id, user_id]
             if classroom_id:
                 params.append(classroom_id)
             if exclude_ids:
                 params.append(tuple(exclude_ids))
-            
-            cursor.execute(query, params)
-            all_results = cursor.fetchall()
-            
-            import random
-            if all_results:
-                chosen_result = random.choice(all_results)
-                video_id, file_path, sentence = chosen_result
-                if context:
-                    context.user_data['current_translator_video_id'] = video_id
-                cursor.close()
-                return file_path, sentence
-            else:
-                cursor.close()
-                return None, None
+
+            rows = self._sample_by_sort_key(cursor, select, params, limit)
+            cursor.close()
+            return rows
         except Exception as error:
-            logger.error(f"Error fetching translator video: {error}")
-            return None, None
+            logger.error(f"Error fetching translator video batch: {error}")
+            return []
+
+    @with_connection
+    def skip_translator_video(self, user_id, video_id):
+        """
+        Keeps a translator video out of the user's batches until
+        clear_translator_video_skips (the user skipped it, or answered it and
+        the answer is still uploading).
+        """
+        connection = self.connection
+        if not connection:
+            return False
 
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO translator_video_skips (user_id, video_id)
+                VALUES (%s, %s)
+                ON CONFLICT (user_id, video_id) DO NOTHING
+                """,
+                (user_id, video_id)
+            )
+            connection.commit()
+            cursor.close()
+            return True
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error skipping translator video {video_id} for user {user_id}: {error}")
+            return False
+
+    @with_connection
+    def clear_translator_video_skips(self, user_id):
+        """
+        Forgets the user's skipped translator videos (a new request session starts).
+        """
+        connection = self.connection
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM translator_video_skips WHERE user_id = %s", (user_id,))
+            connection.commit()
+            cursor.close()
+            return True
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error clearing skipped translator videos of user {user_id}: {error}")
+            return False
+
+    @with_connection
     def get_video_text_id(self, video_id):
         """
         Retrieve the text_id associated with a video.
@@ -352,6 +1168,7 @@ class DatabaseService:
             logger.error(f"Error retrieving text_id for video_id {video_id}: {error}")
             return None
 
+    @with_connection
     def check_sentence_exists(self, sentence):
         """
         Check if a sentence already exists in the database
@@ -378,6 +1195,7 @@ class DatabaseService:
             logger.error(f"Error checking sentence existence: {error}")
             return False
 
+    @with_connection
     def get_all_sentences(self, language):
         """
         Retrieve all sentences for a specific language from the database,
@@ -405,6 +1223,113 @@ class DatabaseService:
             logger.error(f"Error retrieving sentences: {error}")
             return []
 
+    @with_connection
+    def get_sentences_page(self, language, page=1, per_page=10, classroom_id=None):
+        """
+        One page of the sentences listed by get_all_sentences (or, with
+        classroom_id, by get_classroom_sentences), fetched with LIMIT/OFFSET
+        so a page flip reads only that page.
+
+        :param page: 1-based page number.
+        :return: list of sentence strings
+        """
+        connection = self.connection
+        if not connection:
+            return []
+
+        offset = max(page - 1, 0) * per_page
+        try:
+            cursor = connection.cursor()
+            if classroom_id:
+                cursor.execute(
+                    """
+                    SELECT s.sentence_content
+                    FROM public.videos v
+                    JOIN public.sentences s ON v.text_id = s.sentence_id
+                    WHERE v.classroom_id = %s AND s.sentence_language = %s AND v.video_reference_id is NULL
+                    ORDER BY v.uploaded_at DESC
+                    LIMIT %s OFFSET %s
+                    """,
+                    (classroom_id, language, per_page, offset)
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT sentence_content
+                    FROM public.sentences
+                    WHERE sentence_language = %s
+                    ORDER BY sentence_id DESC
+                    LIMIT %s OFFSET %s
+                    """,
+                    (language, per_page, offset)
+                )
+            results = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return results
+        except Exception as error:
+            logger.error(f"Error retrieving sentences page {page}: {error}")
+            return []
+
+    def count_sentences(self, language, classroom_id=None):
+        """
+        Number of sentences get_sentences_page can page through. The count is
+        cached for SENTENCE_COUNT_TTL seconds and dropped when this class adds
+        or deletes sentences, so page flips don't re-count the table. A cached
+        count is returned without checking a connection out of the pool.
+        """
+        cache_key = (language, str(classroom_id) if classroom_id else None)
+        cached = self._sentence_counts.get(cache_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        generation = self._sentence_count_generation
+        count = self._count_sentences(language, classroom_id)
+        # Not if sentences were written meanwhile: the count may predate that
+        if count is not None and generation == self._sentence_count_generation:
+            self._sentence_counts[cache_key] = (count, time.monotonic() + SENTENCE_COUNT_TTL)
+        return count or 0
+
+    @with_connection
+    def _count_sentences(self, language, classroom_id=None):
+        """
+        Counts the sentences on the database. Returns None on error.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            if classroom_id:
+                cursor.execute(
+                    """
+                    SELECT COUNT(*)
+                    FROM public.videos v
+                    JOIN public.sentences s ON v.text_id = s.sentence_id
+                    WHERE v.classroom_id = %s AND s.sentence_language = %s AND v.video_reference_id is NULL
+                    """,
+                    (classroom_id, language)
+                )
+            else:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM public.sentences WHERE sentence_language = %s",
+                    (language,)
+                )
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        except Exception as error:
+            logger.error(f"Error counting sentences: {error}")
+            return None
+
+    def _invalidate_sentence_counts(self):
+        """
+        Drops every cached sentence count (called after sentence writes).
+        """
+        self._sentence_count_generation += 1
+        self._sentence_counts.clear()
+
+    @with_connection
     def get_translator_videos(self, user_id, language, classroom_id=None):
         """
         Return a list of dicts with:
@@ -456,6 +1381,7 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"get_translator_videos error: {e}")
             return []
+    @with_connection
     def update_user_classroom_status(self, user_id, classroom_id):
         """
         Updates the 'joined_classroom' column for the user in the database to the classroom_id.
@@ -480,11 +1406,14 @@ class DatabaseService:
             
             connection.commit()
             cursor.close()
+            if self.user_cache:
+                self.user_cache.invalidate_user(user_id)
             logger.info(f"User {user_id} successfully joined classroom {classroom_id}.")
             return True
         except Exception as error:
             logger.error(f"Error updating classroom status for user {user_id}: {error}")
             return False
+    @with_connection
     def remove_user_from_classroom(self, user_id: int):
         """
         Removes the user from the classroom by setting the classroom_id to NULL.
@@ -510,6 +1439,8 @@ class DatabaseService:
             connection.commit()  # Commit the transaction
 
             cursor.close()
+            if self.user_cache:
+                self.user_cache.invalidate_user(user_id)
             
             logger.info(f"User {user_id} successfully removed from classroom.")
             return True  # Return True if successful
@@ -518,6 +1449,7 @@ class DatabaseService:
             logger.error(f"Error removing user {user_id} from classroom: {error}")
             connection.rollback()  # Rollback in case of error
             return False  # Return False in case of any error    
+    @with_connection
     def validate_classroom_credentials(self, classroom_id: str, password: str):
         """
         Validates the classroom credentials (classroom_id and password).
@@ -553,17 +1485,20 @@ class DatabaseService:
             logger.error(f"Error validating classroom credentials: {error}")
             return False  # Return False in case of any error
             
+    @with_connection
     def delete_sentence_and_video(self, sentence_id, user_id, video_id):
         """
         The 'legacy' approach for when there's exactly 1 video referencing the sentence:
         - If multiple videos share sentence_id, we call delete_single_video(...) instead.
         - Otherwise, remove the 'sentences' row (which cascades to remove the 1 referencing 'videos' row).
-            Also remove the video file if we find it.
+        Returns the file_path of the video object that is no longer used and
+        should be removed from the bucket, or None.
         """
 
         connection = self.connection
         if not connection:
             return
+        self._invalidate_sentence_counts()
 
         try:
             cursor = connection.cursor()
@@ -587,8 +1522,7 @@ class DatabaseService:
                     f"Forwarding to delete_single_video with video_id={video_id}."
                 )
                 # Call our single-video deletion
-                self.delete_single_video(video_id, user_id)
-                return
+                return self.delete_single_video(video_id, user_id)
             else:
                 # => only 1 (or 0) referencing videos => old logic
 
@@ -616,21 +1550,22 @@ class DatabaseService:
                     """,
                     (sentence_id, user_id)
                 )
+                # 3) Drop its reference to the stored object
+                orphaned_path = self._release_video_object(cursor, video_file_path)
                 connection.commit()
 
-                # 3) If you want to remove the file on disk
-                if video_file_path and os.path.exists(video_file_path):
-                    os.remove(video_file_path)
-                    logger.info(f"Deleted video file {video_file_path}")
-
                 cursor.close()
                 logger.info(
                     f"Deleted sentence {sentence_id} (and associated single video) for user {user_id}"
                 )
+                return orphaned_path
         except Exception as error:
+            connection.rollback()
             logger.error(f"Error in delete_sentence_and_video: {error}")
+            return None
 
 
+    @with_connection
     def delete_single_video(self, video_id, user_id):
         """
         Removes exactly one 'videos' row that matches (video_id, user_id).
@@ -638,12 +1573,14 @@ class DatabaseService:
         If none remain, delete the parent 'sentences' row.
         If some remain and the deleted user's ID was also the sentence's owner,
         reassign the sentence's user_id to another referencing user.
-        Also remove the file on disk if desired.
+        Returns the file_path of the video object that is no longer used and
+        should be removed from the bucket, or None.
         """
 
         connection = self.connection
         if not connection:
             return
+        self._invalidate_sentence_counts()
 
         try:
             cursor = connection.cursor()
@@ -666,12 +1603,7 @@ class DatabaseService:
 
             sentence_id, sentence_owner_id, file_path = row
 
-            # 1a) Remove the file on disk if it exists
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-                logger.info(f"Deleted video file {file_path}")
-
-            # 2) Delete just this one 'videos' row
+            # 2) Delete just this one 'videos' row and drop its reference to the stored object
             cursor.execute(
                 """
                 DELETE FROM videos
@@ -680,6 +1612,7 @@ class DatabaseService:
                 """,
                 (video_id, user_id)
             )
+            orphaned_path = self._release_video_object(cursor, file_path)
             connection.commit()
 
             # 3) Check how many videos still reference this sentence
@@ -726,12 +1659,16 @@ class DatabaseService:
                         )
 
             cursor.close()
+            return orphaned_path
 
         except Exception as e:
+            connection.rollback()
             logger.error(f"Error in delete_single_video: {e}")
+            return None
 
 
 
+    @with_connection
     def get_user_videos_and_translator_videos(self, user_id):
         """
         Fetch the user's videos and corresponding translator videos,
@@ -799,9 +1736,83 @@ class DatabaseService:
 
 
 
+    @with_connection
+    def get_user_video_pairs_page(self, user_id, offset=0, limit=10):
+        """
+        One window of get_user_videos_and_translator_videos: the same dicts in
+        the same order (newest first), starting at 'offset'.
+        """
+        if not user_id:
+            return []
+
+        connection = self.connection
+        if not connection:
+            return []
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT
+                    uv.video_id        AS user_video_id,
+                    uv.file_path       AS user_video_path,
+                    tv.file_path       AS translator_video_path,
+                    COALESCE(uv.positive_scores, 0) AS user_upvotes,
+                    COALESCE(uv.negative_scores, 0) AS user_downvotes
+                FROM public.videos uv
+                LEFT JOIN public.videos tv
+                    ON uv.video_reference_id = tv.video_id
+                WHERE uv.user_id = %s
+                ORDER BY uv.uploaded_at DESC, uv.video_id DESC
+                LIMIT %s OFFSET %s
+                """,
+                (user_id, limit, offset)
+            )
+            results = cursor.fetchall()
+            cursor.close()
+
+            return [
+                {
+                    'user_video_id':         row[0],
+                    'user_video_path':       row[1],
+                    'translator_video_path': row[2],
+                    'user_upvotes':          row[3],
+                    'user_downvotes':        row[4],
+                }
+                for row in results
+            ]
+        except Exception as error:
+            logger.error(f"Error fetching user's videos (offset {offset}): {error}")
+            return []
+
+    @with_connection
+    def count_user_videos(self, user_id):
+        """
+        Number of videos uploaded by the user.
+        """
+        if not user_id:
+            return 0
+
+        connection = self.connection
+        if not connection:
+            return 0
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM public.videos WHERE user_id = %s", (user_id,))
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        except Exception as error:
+            logger.error(f"Error counting user's videos: {error}")
+            return 0
+
+    @with_connection
     def delete_user_video(self, video_id, user_id):
         """
-        Delete a user's video from the database and file system.
+        Delete a user's video from the database.
+        Returns the file_path of the video object that is no longer used and
+        should be removed from the bucket, or None.
         """
         if not user_id:
             return
@@ -832,60 +1843,157 @@ class DatabaseService:
                     """,
                     (video_id, user_id)
                 )
+                orphaned_path = self._release_video_object(cursor, video_file_path)
                 connection.commit()
 
-                # Delete the file from the file system
-        
                 cursor.close()
                 logger.info(f"Deleted user video {video_id} for user {user_id}")
-                #return file path
+                return orphaned_path
             else:
                 logger.error(f"Video with id {video_id} not found for user {user_id}")
                 cursor.close()
         except Exception as error:
+            connection.rollback()
             logger.error(f"Error deleting user video: {error}")
             
 
+    @with_connection
+    def get_media_file_ids(self):
+        """
+        Returns every cached Telegram file_id as {media_key: file_id}.
+        """
+        connection = self.connection
+        if not connection:
+            return {}
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT media_key, file_id FROM media_cache")
+            rows = cursor.fetchall()
+            cursor.close()
+            return dict(rows)
+        except Exception as error:
+            logger.error(f"Error loading media cache: {error}")
+            return {}
+
+    @with_connection
+    def save_media_file_id(self, media_key, file_id):
+        """
+        Stores (or replaces) the Telegram file_id for a local path / S3 URL.
+        """
+        connection = self.connection
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO media_cache (media_key, file_id, updated_at)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (media_key)
+                DO UPDATE SET file_id = EXCLUDED.file_id, updated_at = EXCLUDED.updated_at
+                """,
+                (media_key, file_id)
+            )
+            connection.commit()
+            cursor.close()
+            return True
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error saving media file_id for {media_key}: {error}")
+            return False
+
+    @with_connection
+    def delete_media_file_id(self, media_key):
+        """
+        Forgets the Telegram file_id of a local path / S3 URL.
+        """
+        connection = self.connection
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM media_cache WHERE media_key = %s", (media_key,))
+            connection.commit()
+            cursor.close()
+            return True
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error deleting media file_id for {media_key}: {error}")
+            return False
+
+    @with_connection
     def get_random_video_for_voting(self, user_id, language):
         """
         Fetch a random video (user or translator) not uploaded by the current user,
         and not yet voted on by the current user.
         Returns (video_id, file_path, sentence_content) or None if no video found.
         """
+        candidates = self.get_voting_candidates(user_id, language, limit=1, priority='random')
+        return candidates[0] if candidates else None
+
+    @with_connection
+    def get_voting_candidates(self, user_id, language, limit=20, exclude_ids=None, priority=None):
+        """
+        Returns up to 'limit' videos the user can vote on: not uploaded by them
+        and not yet voted on by them (NOT EXISTS anti-join on votes_user_video_key).
+        Only the returned rows are read, never the whole candidate set.
+
+        :param exclude_ids: Video ids to leave out (e.g. the one currently shown).
+        :param priority: 'random' - a uniform random sample, read from a random point
+                         of videos_lang_sort_idx (see _sample_by_sort_key).
+                         'fewest_votes' - videos with the fewest up + down votes first,
+                         so voting effort spreads evenly over the catalogue.
+                         Defaults to the voting_priority config key.
+        :return: list of (video_id, file_path, sentence_content)
+        """
+        priority = priority or self.voting_priority
         connection = self.connection
         if not connection:
             logger.error("Failed to connect to database")
-            return None
-        
+            return []
+
         try:
             cursor = connection.cursor()
-            cursor.execute(
-                """
+
+            exclude_clause = "AND v.video_id NOT IN %s" if exclude_ids else ""
+            select = f"""
                 SELECT v.video_id, v.file_path, s.sentence_content
                 FROM videos v
                 LEFT JOIN sentences s ON v.text_id = s.sentence_id
                 WHERE v.language = %s
                   AND v.user_id != %s
-                  AND v.video_id NOT IN (
-                      SELECT video_id FROM votes WHERE user_id = %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM votes vo
+                      WHERE vo.user_id = %s AND vo.video_id = v.video_id
                   )
-                """,
-                (language, user_id, user_id)
-            )
-            all_results = cursor.fetchall()
-            if all_results:
-                import random
-                chosen_result = random.choice(all_results)
-                video_id, file_path, sentence_content = chosen_result
-                cursor.close()
-                return video_id, file_path, sentence_content
+                  {exclude_clause}
+            """
+            params = [language, user_id, user_id]
+            if exclude_ids:
+                params.append(tuple(exclude_ids))
+
+            if priority == 'fewest_votes':
+                cursor.execute(
+                    f"""
+                    {select}
+                    ORDER BY COALESCE(v.positive_scores, 0) + COALESCE(v.negative_scores, 0), v.video_id
+                    LIMIT %s
+                    """,
+                    params + [limit]
+                )
+                rows = cursor.fetchall()
             else:
-                cursor.close()
-                return None
+                rows = self._sample_by_sort_key(cursor, select, params, limit)
+            cursor.close()
+            return rows
         except Exception as error:
-            logger.error(f"Error fetching random video for voting: {error}")
-            return None
+            logger.error(f"Error fetching voting candidates: {error}")
+            return []
 
+    @with_connection
     def increment_video_score(self, video_id, score_type):
         """
         Increment the positive_scores or negative_scores column for a video.
@@ -915,6 +2023,7 @@ class DatabaseService:
             logger.error(f"Error updating {score_type} for video {video_id}: {error}")
 
 
+    @with_connection
     def record_vote(self, user_id, video_id, vote_type):
         """
         Record a vote in the votes table. vote_type should be 'up' or 'down'.
@@ -946,6 +2055,197 @@ class DatabaseService:
             logger.error(f"Error recording vote: {error}")
             return None
 
+    @with_connection
+    def cast_vote(self, user_id, video_id, vote_type):
+        """
+        Records a vote and bumps the video's positive/negative score in one
+        statement, so both happen (or neither does) in a single round trip.
+
+        Idempotent per (user, video): if the user already voted on this video
+        (e.g. a double-tap), nothing is counted again and the existing vote is
+        returned. Its vote_type may differ from the requested one (an up vote
+        followed by a down tap); callers check it.
+
+        Without votes_user_video_key (see ensure_schema) the vote is taken
+        under an advisory lock on (user, video) instead of ON CONFLICT.
+
+        :param vote_type: 'up' or 'down'
+        :return: (vote_id, stored vote_type), or (None, None) on error
+        """
+        score_columns = {'up': 'positive_scores', 'down': 'negative_scores'}
+        if vote_type not in score_columns:
+            logger.error(f"Invalid vote type: {vote_type}")
+            return None, None
+        score_type = score_columns[vote_type]
+
+        connection = self.connection
+        if not connection:
+            return None, None
+
+        try:
+            cursor = connection.cursor()
+            if not self._votes_unique_index:
+                row = self._cast_vote_locked(cursor, user_id, video_id, vote_type, score_type)
+            else:
+                # On a conflict DO UPDATE (a no-op write) waits for and locks the
+                # existing row and returns it, which DO NOTHING would not: its
+                # vote_id comes back even if the other vote committed after this
+                # statement's snapshot was taken. xmax = 0 only for a fresh insert.
+                cursor.execute(
+                    f"""
+                    WITH upserted AS (
+                        INSERT INTO votes (user_id, video_id, vote_type, vote_timestamp)
+                        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                        ON CONFLICT (user_id, video_id) DO UPDATE SET vote_id = votes.vote_id
+                        RETURNING vote_id, vote_type, (xmax = 0) AS inserted
+                    ), bumped AS (
+                        UPDATE videos
+                        SET {score_type} = COALESCE({score_type}, 0) + 1
+                        WHERE video_id = %s
+                          AND EXISTS (SELECT 1 FROM upserted WHERE inserted)
+                    )
+                    SELECT vote_id, vote_type FROM upserted
+                    """,
+                    (user_id, video_id, vote_type, video_id)
+                )
+                row = cursor.fetchone()
+            connection.commit()
+            cursor.close()
+            return (row[0], row[1]) if row else (None, None)
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error casting vote: {error}")
+            return None, None
+
+    @staticmethod
+    def _cast_vote_locked(cursor, user_id, video_id, vote_type, score_type):
+        """
+        cast_vote for databases without the unique index: concurrent votes of
+        one user on one video serialize on a transaction-level advisory lock.
+        Returns (vote_id, vote_type) of the earliest vote; the caller commits.
+        """
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (user_id, video_id))
+        cursor.execute(
+            """
+            SELECT vote_id, vote_type FROM votes
+            WHERE user_id = %s AND video_id = %s
+            ORDER BY vote_id
+            LIMIT 1
+            """,
+            (user_id, video_id)
+        )
+        row = cursor.fetchone()
+        if row:
+            return row
+        cursor.execute(
+            """
+            INSERT INTO votes (user_id, video_id, vote_type, vote_timestamp)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+            RETURNING vote_id, vote_type
+            """,
+            (user_id, video_id, vote_type)
+        )
+        row = cursor.fetchone()
+        cursor.execute(
+            f"UPDATE videos SET {score_type} = COALESCE({score_type}, 0) + 1 WHERE video_id = %s",
+            (video_id,)
+        )
+        return row
+
+    @with_connection
+    def merge_duplicate_votes(self):
+        """
+        Migration for databases holding several votes of one user on the same
+        video (possible before cast_vote was idempotent), which keep
+        votes_user_video_key from being built. ensure_schema runs it while
+        that index does not exist yet.
+
+        The earliest vote of each (user, video) is kept. The later ones are
+        copied to merged_duplicate_votes (with their feedback and the vote_id
+        they were merged into), their feedback is logged, the scores they added
+        to videos.positive_scores / negative_scores are subtracted, and then
+        they are deleted, all in one transaction.
+
+        :return: dict with the number of merged votes and score corrections,
+                 or None on error.
+        """
+        connection = self.connection
+        if not connection:
+            return None
+
+        duplicates = """
+            FROM votes a
+            WHERE EXISTS (
+                SELECT 1 FROM votes b
+                WHERE b.user_id = a.user_id AND b.video_id = a.video_id AND b.vote_id < a.vote_id
+            )
+        """
+        autocommit = connection.autocommit  # True when called from ensure_schema
+        connection.autocommit = False
+        try:
+            cursor = connection.cursor()
+            # No new votes while duplicates are counted and removed
+            cursor.execute("LOCK TABLE votes IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.merged_duplicate_votes (
+                    LIKE public.votes,
+                    merged_into INTEGER,
+                    merged_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO merged_duplicate_votes
+                SELECT a.*,
+                       (SELECT MIN(b.vote_id) FROM votes b
+                        WHERE b.user_id = a.user_id AND b.video_id = a.video_id),
+                       CURRENT_TIMESTAMP
+                {duplicates}
+                """
+            )
+            merged = cursor.rowcount
+
+            cursor.execute(f"SELECT a.vote_id, a.user_id, a.video_id, a.feedback {duplicates} AND a.feedback IS NOT NULL")
+            for vote_id, user_id, video_id, feedback in cursor.fetchall():
+                logger.warning(
+                    f"Merging duplicate vote {vote_id} (user {user_id}, video {video_id}) "
+                    f"with feedback: {feedback!r}"
+                )
+
+            cursor.execute(
+                f"""
+                UPDATE videos v
+                SET positive_scores = GREATEST(COALESCE(v.positive_scores, 0) - d.up, 0),
+                    negative_scores = GREATEST(COALESCE(v.negative_scores, 0) - d.down, 0)
+                FROM (
+                    SELECT a.video_id,
+                           COUNT(*) FILTER (WHERE a.vote_type = 'up') AS up,
+                           COUNT(*) FILTER (WHERE a.vote_type = 'down') AS down
+                    {duplicates}
+                    GROUP BY a.video_id
+                ) d
+                WHERE v.video_id = d.video_id
+                """
+            )
+            corrected_videos = cursor.rowcount
+
+            cursor.execute(f"DELETE FROM votes WHERE vote_id IN (SELECT a.vote_id {duplicates})")
+            connection.commit()
+            cursor.close()
+        except Exception as error:
+            connection.rollback()
+            logger.error(f"Error merging duplicate votes: {error}")
+            return None
+        finally:
+            connection.autocommit = autocommit
+
+        if merged:
+            logger.info(f"Merged {merged} duplicate votes, corrected the scores of {corrected_videos} videos.")
+        return {'merged_votes': merged, 'corrected_videos': corrected_videos}
+
+    @with_connection
     def update_vote_feedback(self, vote_id, feedback_text):
         """
         Update the feedback column for the specified vote_id.
@@ -971,6 +2271,7 @@ class DatabaseService:
             logger.error(f"Error updating feedback for vote_id={vote_id}: {error}")
 
   
+    @with_connection
     def get_user_rank(self, user_id: int, user_role: str):
         """
         Retrieves the rank and points of a specific user within their own role category (User or Translator).
@@ -1016,6 +2317,7 @@ class DatabaseService:
         except Exception as error:
             logger.error(f"Error retrieving user rank: {error}")
             return None, []
+    @with_connection
     def get_all_users(self):
         """
         Retrieve all users from the database.
@@ -1037,6 +2339,7 @@ class DatabaseService:
             logger.error(f"Error retrieving all users: {error}")
             return []
 
+    @with_connection
     def get_users_filtered(self, column, value):
         """
         Retrieve users filtered by a specific column (e.g., role, status).
@@ -1059,6 +2362,69 @@ class DatabaseService:
             logger.error(f"Error retrieving users by filter ({column}={value}): {error}")
             return []
 
+    @with_connection
+    def get_users_page(self, after_id=None, before_id=None, limit=10, column=None, value=None):
+        """
+        One page of users in user_id order, using keyset pagination so each page
+        costs the same no matter how deep the admin has paged.
+
+        :param after_id: Return the users right after this user_id (next page).
+        :param before_id: Return the users right before this user_id (previous page).
+                          With neither cursor the first page is returned.
+        :param limit: Page size.
+        :param column: Optional column to filter by (must be a valid users column).
+        :param value: Value the filter column must equal.
+        :return: (rows, has_more) where rows are
+                 (user_id, username, country, user_role, telegram_id) in ascending
+                 user_id order, and has_more tells if more rows exist beyond the
+                 page in the direction that was paged (after / before).
+        """
+        connection = self.connection
+        if not connection:
+            return [], False
+
+        try:
+            cursor = connection.cursor()
+            conditions = []
+            params = []
+            if column:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+            if before_id is not None:
+                conditions.append("user_id < %s")
+                params.append(before_id)
+                order = "DESC"
+            else:
+                if after_id is not None:
+                    conditions.append("user_id > %s")
+                    params.append(after_id)
+                order = "ASC"
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            # One extra row tells whether another page exists
+            cursor.execute(
+                f"""
+                SELECT user_id, username, country, user_role, telegram_id
+                FROM public.users
+                {where}
+                ORDER BY user_id {order}
+                LIMIT %s
+                """,
+                params + [limit + 1]
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if order == "DESC":
+                rows.reverse()
+            return rows, has_more
+        except Exception as error:
+            logger.error(f"Error retrieving users page: {error}")
+            return [], False
+
+    @with_connection
     def update_user_info(self, user_id, column, new_value):
         """
         Update a specific column for a user.
@@ -1077,32 +2443,45 @@ class DatabaseService:
             connection.commit()
             success = cursor.rowcount > 0  # Check if any row was updated
             cursor.close()
+            if self.user_cache:
+                self.user_cache.invalidate_user(user_id)
 
             return success
         except Exception as error:
             logger.error(f"Error updating user {user_id}: {error}")
             return False
+    @with_connection
     def delete_user(self, user_id):
         """
         Deletes a user from the database.
         :param user_id: The ID of the user to delete.
+        :return: (success, orphaned_paths) where orphaned_paths are the stored
+                 video objects that only this user's (cascaded) videos used;
+                 remove them with VideoStore.delete_many.
         """
         connection = self.connection
         if not connection:
-            return False
+            return False, []
 
         try:
             cursor = connection.cursor()
+            cursor.execute("SELECT file_path FROM public.videos WHERE user_id = %s", (user_id,))
+            file_paths = [row[0] for row in cursor.fetchall()]
             cursor.execute("DELETE FROM public.users WHERE user_id = %s", (user_id,))
-            connection.commit()
             success = cursor.rowcount > 0  # Check if any row was deleted
+            orphaned_paths = self._release_video_objects(cursor, file_paths) if success else []
+            connection.commit()
             cursor.close()
+            if self.user_cache:
+                self.user_cache.invalidate_user(user_id)
 
-            return success
+            return success, orphaned_paths
         except Exception as error:
+            connection.rollback()
             logger.error(f"Error deleting user {user_id}: {error}")
-            return False
+            return False, []
         
+    @with_connection
     def get_user_table_columns(self):
         """
         Fetch the column names of the 'users' table.
@@ -1128,6 +2507,7 @@ class DatabaseService:
             return []
 
 
+    @with_connection
     def get_feedback_for_video(self, video_id):
         """
         Returns a list of feedback (strings) from the votes table
@@ -1161,6 +2541,7 @@ class DatabaseService:
             return []
 
 
+    @with_connection
     def check_if_feedback_exists(self, video_id):
         """
         Returns True if there is at least one feedback for the given video_id,
@@ -1192,6 +2573,7 @@ class DatabaseService:
             logger.error(f"Error checking feedback existence for video {video_id}: {e}")
             return False
     
+    @with_connection
     def get_classrooms_for_user(self, user_id):
         """
         Retrieves the list of classrooms owned by a specific user, including passwords.
@@ -1225,6 +2607,7 @@ class DatabaseService:
             return None
         
         
+    @with_connection
     def create_classroom(self, user_id, classname, password):
         """
         Inserts a new classroom for the given user.
@@ -1251,25 +2634,38 @@ class DatabaseService:
         except Exception as error:
             logger.error(f"Error creating classroom: {error}")
             return None
-    def delete_classroom(self, classroom_id: str) -> bool:
+    @with_connection
+    def delete_classroom(self, classroom_id: str):
         """
         Deletes a classroom from the database.
         :param classroom_id: The ID of the classroom to delete.
-        :return: True if deletion was successful, False otherwise.
+        :return: (success, orphaned_paths) where success is True if deletion was
+                 successful, and orphaned_paths are the stored video objects no
+                 video uses after the (cascaded) delete; remove them with
+                 VideoStore.delete_many.
         """
         connection = self.connection
         if not connection:
-            return False
+            return False, []
 
         try:
             cursor = connection.cursor()
+            cursor.execute("SELECT file_path FROM public.videos WHERE classroom_id = %s", (str(classroom_id),))
+            file_paths = [row[0] for row in cursor.fetchall()]
             cursor.execute("DELETE FROM public.classroom WHERE classroom_id = %s", (classroom_id,))
+            orphaned_paths = self._release_video_objects(cursor, file_paths)
             connection.commit()
             cursor.close()
-            return True  # ✅ Deletion successful
+            # Members' joined_classroom may have been cleared by the FK, which
+            # the per-user entries can't see
+            if self.user_cache:
+                self.user_cache.clear()
+            return True, orphaned_paths  # ✅ Deletion successful
         except Exception as error:
+            connection.rollback()
             logger.error(f"Error deleting classroom {classroom_id}: {error}")
-            return False  # ❌ Deletion failed
+            return False, []  # ❌ Deletion failed
+    @with_connection
     def get_classroom_sentences(self, classroom_id, language):
         """
         Fetch all sentences from videos that belong to a specific classroom.
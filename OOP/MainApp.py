@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import random
-from cancel import cancel_restarted_message
+import signal
+from cancel import cancel_restarted_message, timeout_tracker
 from functools import partial
 from admin import save_user_report
 from telegram import (
@@ -18,7 +20,6 @@ from telegram.ext import (
     ConversationHandler
 )
 
-from apscheduler.jobstores.base import JobLookupError
 
 # =========================
 # 1) Import your classes and states from each module
@@ -26,6 +27,15 @@ from apscheduler.jobstores.base import JobLookupError
 # =========================
 
 from DatabaseService import DatabaseService
+from AsyncDatabaseService import AsyncDatabaseService
+from BucketService import BucketService
+from UploadQueue import UploadQueue
+from VideoStore import RoutingVideoStore
+from StorageReconciler import StorageReconciler
+from MediaCache import MediaCache
+from Persistence import BatchedPersistence
+from UpdateProcessor import PerChatUpdateProcessor
+from WebhookServer import WebhookServer
 from TranslationManager import TranslationManager
 # RegistrationHandlers file has the class + the states: LANGUAGE_SELECTION, ASK_PERMISSION, ROLE_SELECTION
 from RegistrationHandlers import (
@@ -90,14 +100,12 @@ def read_bot_token(token_file="token.txt") -> str:
 # FALLBACK / CANCEL / "BOT RESTARTED" LOGIC
 # ====================================================================
 
-async def send_bot_restarted(context: ContextTypes.DEFAULT_TYPE):
+async def send_bot_restarted(bot, chat_id):
     """
-    This job is triggered if no other handler claims the update
+    Triggered by the timeout tracker if no other handler claims the update
     within a certain time, instructing the user to /start again.
     """
-    job = context.job
-    chat_id = job.chat_id
-    await context.bot.send_message(
+    await bot.send_message(
         chat_id=chat_id,
         text="Bot restarted. Please press the /start button to begin again.",
         reply_markup=ReplyKeyboardMarkup([["/start"]], resize_keyboard=True, one_time_keyboard=True)
@@ -107,23 +115,13 @@ def schedule_restarted_message(update: Update, context: ContextTypes.DEFAULT_TYP
     """
     Schedules 'send_bot_restarted' after, e.g., 20 seconds,
     unless a handler cancels it via cancel_restarted_message.
+    This runs for nearly every update, so it uses the in-memory timeout
+    tracker (a dict + heap) instead of creating and removing scheduler jobs.
     """
-    if RESTART_JOB_KEY in context.user_data:
-        old_job = context.user_data[RESTART_JOB_KEY]
-        try:
-            old_job.schedule_removal()
-        except JobLookupError:
-            pass
-        del context.user_data[RESTART_JOB_KEY]
-
-    # Example: 20 seconds
-    job = context.application.job_queue.run_once(
-        send_bot_restarted,
-        when=2,
-        chat_id=update.effective_chat.id,
-        name=str(update.effective_chat.id)
-    )
-    context.user_data[RESTART_JOB_KEY] = job
+    chat_id = update.effective_chat.id
+    # Re-scheduling the same chat replaces its previous deadline
+    timeout_tracker.schedule(chat_id, 2, send_bot_restarted, context.bot, chat_id)
+    context.user_data[RESTART_JOB_KEY] = chat_id
 
 
 def with_fallback_timeout(handler_func):
@@ -162,25 +160,79 @@ async def cancel_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 # MAIN APPLICATION CLASS (OOP) tying everything together
 # ====================================================================
 class MainApplication:
-    def __init__(self, config_path='config.txt', translations_dir='translations', token_file='token.txt'):
+    def __init__(self, config_path='config.txt', translations_dir='translations', token_file='token.txt', async_db=None):
         """
         Sets up DB/translation services, the handler classes, 
         and the Telegram application.
+
+        :param async_db: True runs DB queries on a worker pool so handlers never block
+                         the event loop; False runs them inline. If None, the
+                         'db_async' key of the config file decides (default: true).
         """
         # 1) Load the bot token from token.txt
         self.token = read_bot_token(token_file)
 
         # 2) Initialize database and translation managers
-        self.db_service = DatabaseService(config_path)
+        sync_db_service = DatabaseService(config_path)
+        self.config = sync_db_service.config
+        if async_db is None:
+            async_db = sync_db_service.config.get('db_async', 'true').lower() != 'false'
+        self.db_service = AsyncDatabaseService(sync_db_service, offload=async_db)
         self.translation_manager = TranslationManager(translations_dir)
+        # One S3 client for the whole bot (see BucketService.from_config for s3_* keys)
+        self.bucket_service = BucketService.from_config(sync_db_service.config)
+        # Every video read, write and delete goes through this (see RoutingVideoStore.from_config)
+        self.video_store = RoutingVideoStore.from_config(self.bucket_service, sync_db_service.config)
+        # Background S3 uploads (see UploadQueue.from_config for upload_* keys)
+        self.upload_queue = UploadQueue.from_config(self.video_store, sync_db_service.config)
+        # Telegram file_ids of sent videos, so they are not uploaded again
+        self.media_cache = MediaCache(self.db_service, self.video_store)
+        # Removes S3 objects no video row uses any more (see StorageReconciler.from_config)
+        self.storage_reconciler = StorageReconciler.from_config(self.db_service, self.bucket_service, sync_db_service.config)
 
     
-        self.registration_handlers = RegistrationHandlers(self.db_service, self.translation_manager)
-        self.user_handlers = UserHandlers(self.db_service, self.translation_manager)
-        self.translator_handlers = TranslatorHandlers(self.db_service, self.translation_manager)
+        self.registration_handlers = RegistrationHandlers(self.db_service, self.translation_manager, self.bucket_service, self.media_cache)
+        self.user_handlers = UserHandlers(self.db_service, self.translation_manager, self.bucket_service, self.upload_queue, self.media_cache)
+        self.translator_handlers = TranslatorHandlers(self.db_service, self.translation_manager, self.bucket_service, self.upload_queue, self.media_cache)
         self.admin_handlers= AdminHandlers(self.db_service, self.translation_manager)
-        # 4) Build the Telegram application
-        self.application = Application.builder().token(self.token).build()
+        # 4) Build the Telegram application. user_data, bot_data and conversation
+        #    states survive restarts (see BatchedPersistence.from_config for persistence_* keys)
+        self.persistence = BatchedPersistence.from_config(sync_db_service.config, sync_db_service.pool)
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if self.persistence is not None:
+            builder = builder.persistence(self.persistence)
+        # 'polling' (default) or 'webhook' (see run_webhook). In webhook mode the
+        # update queue is bounded so a flood of pushed updates gets 503 (and is
+        # retried by Telegram) instead of piling up in memory.
+        self.update_mode = self.config.get('update_mode', 'polling').lower()
+        if self.update_mode == 'webhook':
+            builder = builder.update_queue(asyncio.Queue(maxsize=int(self.config.get('webhook_queue_size', 1000))))
+        # Updates of different chats run in parallel, each chat stays in order.
+        # concurrent_updates=1 in the config restores sequential processing.
+        concurrent_updates = int(sync_db_service.config.get('concurrent_updates', 32))
+        if concurrent_updates > 1:
+            builder = builder.concurrent_updates(PerChatUpdateProcessor(concurrent_updates))
+        self.application = builder.build()
+
+    async def post_init(self, application: Application):
+        """
+        Starts background workers once the event loop is running.
+        """
+        await self.upload_queue.start()
+        await self.media_cache.load()
+
+    async def post_shutdown(self, application: Application):
+        """
+        Lets queued uploads finish, then releases network resources.
+        """
+        await self.upload_queue.stop()
+        await self.bucket_service.aclose()
+        await timeout_tracker.stop()
 
     async def generate_random_otp(self, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -192,6 +244,36 @@ class MainApplication:
         context.bot_data['latest_otp'] = latest_otp
         logger.info(f"Generated OTP: {latest_otp}")
 
+    async def log_upload_metrics(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Periodically logs upload queue depth, throughput and latency,
+        and the hit rates of the media and user profile caches.
+        """
+        logger.info(f"Upload queue metrics: {self.upload_queue.metrics()}")
+        logger.info(f"Media cache stats: {self.media_cache.stats()}")
+        if self.db_service.user_cache:
+            logger.info(f"User profile cache stats: {self.db_service.user_cache.stats()}")
+
+    async def log_dedupe_report(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Periodically logs how much storage content-addressed deduplication
+        saves (stored vs. logical bytes) and how many uploads it skipped.
+        """
+        stats = await self.db_service.get_dedupe_stats()
+        if stats:
+            logger.info(
+                f"Video dedupe: {stats['references']} videos share {stats['objects']} objects, "
+                f"{stats['stored_bytes']} bytes stored for {stats['logical_bytes']} uploaded "
+                f"(ratio {stats['dedupe_ratio']:.2f}, {stats['saved_bytes']} bytes saved); "
+                f"{self.upload_queue.deduplicated} queued uploads dropped as duplicates since start"
+            )
+
+    async def reload_translations(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Periodically reloads translation files whose mtime changed.
+        """
+        await asyncio.to_thread(self.translation_manager.reload_if_changed, True)
+
     async def handle_page_navigation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Handles inline button presses for pagination.
@@ -203,8 +285,10 @@ class MainApplication:
 
         if callback_data.startswith("page_"):
             new_page = int(callback_data.split("_")[1])
+            if new_page == context.user_data.get('current_page'):
+                return  # Already showing that page, nothing to fetch
             context.user_data['current_page'] = new_page  # Update stored page number
-            return await self.translator_handlers.display_sentences_page(update, context)  # Refresh page display
+            return await self.translator_handlers.display_sentences_page(update, context)  # Fetches just this page
 
 
 
@@ -215,6 +299,17 @@ class MainApplication:
         """
         job_queue = self.application.job_queue
         job_queue.run_repeating(self.generate_random_otp, interval=300, first=1)
+        job_queue.run_repeating(self.log_upload_metrics, interval=60, first=60)
+        job_queue.run_repeating(self.log_dedupe_report, interval=3600, first=300)
+        # Picks up edited translation files without a restart (0 disables it)
+        reload_interval = float(self.config.get('translations_reload_interval', 30))
+        if reload_interval > 0:
+            job_queue.run_repeating(self.reload_translations, interval=reload_interval, first=reload_interval)
+        # Orphaned S3 objects / dangling video rows. Opt-in: off unless reconcile_interval
+        # is set, and report-only until reconcile_dry_run=false (nothing to do without S3)
+        reconcile_interval = float(self.config.get('reconcile_interval', 0))
+        if reconcile_interval > 0 and self.config.get('video_store', 's3').lower() != 'memory':
+            job_queue.run_repeating(self.storage_reconciler.run, interval=reconcile_interval, first=600)
     def setup_conversation_handler(self):
         """
         Create the ConversationHandler referencing the states from your OOP classes,
@@ -346,6 +441,8 @@ class MainApplication:
 
                 MessageHandler(filters.Regex("(?i)^cancel$"), cancel_handler)
             ],
+            name="main_conversation",
+            persistent=self.persistence is not None,
         )
 
         return conv_handler
@@ -369,9 +466,52 @@ class MainApplication:
         self.application.add_handler(conv_handler, group=1)
 
         logger.info("Starting the bot. Press Ctrl+C to stop.")
-        self.application.run_polling()
+        if self.update_mode == 'webhook':
+            asyncio.run(self.run_webhook())
+        else:
+            self.application.run_polling()
+        self.db_service.close()
         logger.info("Bot has stopped.")
 
+    async def run_webhook(self):
+        """
+        Webhook mode: Telegram pushes updates to our own WebhookServer
+        (see WebhookServer.from_config for webhook_* keys) instead of being polled.
+        If webhook_url is set, the webhook is registered with Telegram;
+        without it the server only listens, e.g. for POSTing recorded updates locally.
+        Runs until SIGINT/SIGTERM, then drains in-flight requests and queued updates.
+        """
+        application = self.application
+        server = WebhookServer.from_config(application, self.config)
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass  # e.g. Windows
+
+        await application.initialize()
+        await self.post_init(application)
+        webhook_url = self.config.get('webhook_url')
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=server.secret_token,
+                max_connections=int(self.config.get('webhook_max_connections', 40))
+            )
+        await application.start()
+        await server.start()
+        try:
+            await stop_event.wait()
+        finally:
+            # Stop intake first, then let the Application process what is queued
+            await server.stop()
+            await application.stop()
+            await application.shutdown()
+            await self.post_shutdown(application)
+
 
 if __name__ == "__main__":
     # You can set up logging here if needed.
@@ -0,0 +1,162 @@
+import logging
+
+from telegram import InputMediaVideo
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    def __init__(self, db_service=None, video_store=None):
+        """
+        Remembers the Telegram file_id of every video the bot has sent, keyed by
+        its source (a local path or an S3 URL). Once Telegram has a copy, later
+        sends pass the file_id instead of re-uploading the file or re-signing
+        and re-downloading the S3 object.
+
+        :param db_service: Optional (async) DatabaseService; when given, entries
+                           are persisted in the media_cache table and survive restarts.
+        :param video_store: VideoStore the videos are read from on a cache miss.
+        """
+        self.db_service = db_service
+        self.video_store = video_store
+        self._file_ids = {}  # media key -> Telegram file_id
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self):
+        """
+        Loads the persisted file_ids. Call once the event loop is running.
+        """
+        if self.db_service is None:
+            return
+        self._file_ids.update(await self.db_service.get_media_file_ids())
+        logger.info(f"Media cache loaded with {len(self._file_ids)} file_ids.")
+
+    def get(self, key):
+        """
+        Returns the cached file_id for key, or None.
+        """
+        file_id = self._file_ids.get(key)
+        if file_id:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return file_id
+
+    async def put(self, key, file_id):
+        """
+        Remembers (and persists) the file_id Telegram assigned to key.
+        """
+        if not file_id or self._file_ids.get(key) == file_id:
+            return
+        self._file_ids[key] = file_id
+        if self.db_service is not None:
+            await self.db_service.save_media_file_id(key, file_id)
+
+    async def invalidate(self, key):
+        """
+        Forgets key, e.g. because a new file was written under the same path
+        or Telegram no longer accepts the stored file_id.
+        """
+        if self._file_ids.pop(key, None) and self.db_service is not None:
+            await self.db_service.delete_media_file_id(key)
+
+    def stats(self):
+        """
+        Returns hit/miss counters, the hit rate and the number of cached ids.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._file_ids),
+        }
+
+    @staticmethod
+    def _file_id_of(message):
+        """
+        The file_id of the video in a sent message (Telegram may store a
+        silent mp4 as an animation or a large one as a document).
+        """
+        if not message or isinstance(message, bool):
+            return None
+        media = message.video or message.animation or message.document
+        return media.file_id if media else None
+
+    async def _source(self, key):
+        """
+        What to hand to Telegram on a miss (see VideoStore.telegram_source), or None.
+        """
+        if self.video_store is None:
+            return None
+        try:
+            return await self.video_store.telegram_source(key)
+        except Exception as e:
+            logger.error(f"Could not read video {key}: {e}")
+            return None
+
+    async def reply_video(self, message, key, **kwargs):
+        """
+        message.reply_video for the video stored at key (local path or S3 URL),
+        using the cached file_id when there is one.
+
+        :return: The sent Message, or None if the source could not be found.
+        """
+        file_id = self.get(key)
+        if file_id:
+            try:
+                return await message.reply_video(video=file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Cached file_id for {key} rejected ({e}), re-sending.")
+                await self.invalidate(key)
+
+        source = await self._source(key)
+        if source is None:
+            logger.error(f"Video not found: {key}")
+            return None
+        try:
+            sent = await message.reply_video(video=source, **kwargs)
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+        await self.put(key, self._file_id_of(sent))
+        return sent
+
+    async def edit_video(self, bot, chat_id, message_id, key, caption=None, reply_markup=None):
+        """
+        bot.edit_message_media with the video stored at key, using the cached
+        file_id when there is one.
+
+        :return: The edited Message, or None if the source could not be found.
+        """
+        async def edit(media):
+            return await bot.edit_message_media(
+                chat_id=chat_id,
+                message_id=message_id,
+                media=InputMediaVideo(media=media, caption=caption),
+                reply_markup=reply_markup
+            )
+
+        file_id = self.get(key)
+        if file_id:
+            try:
+                return await edit(file_id)
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return None
+                logger.warning(f"Cached file_id for {key} rejected ({e}), re-sending.")
+                await self.invalidate(key)
+
+        source = await self._source(key)
+        if source is None:
+            logger.error(f"Video not found: {key}")
+            return None
+        try:
+            edited = await edit(source)
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+        await self.put(key, self._file_id_of(edited))
+        return edited
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+# user_data entries that only make sense inside the running process
+# (e.g. the pending "Bot restarted" timeout, see cancel.py)
+TRANSIENT_USER_DATA_KEYS = ('restart_job',)
+
+
+class BatchedPersistence(BasePersistence):
+    def __init__(self, flush_delay=1.0, update_interval=10, transient_keys=TRANSIENT_USER_DATA_KEYS):
+        """
+        Base for the bot's persistence backends: keeps user_data, chat_data,
+        bot_data and ConversationHandler states across restarts.
+
+        PTB hands over changed data every 'update_interval' seconds; those
+        updates are coalesced per key in memory and written in one batch
+        'flush_delay' seconds later, off the event loop. Subclasses only
+        implement _read_rows / _write_rows for their storage.
+
+        :param flush_delay: Seconds to collect updates before writing a batch.
+        :param update_interval: How often PTB pushes changed data (seconds).
+        :param transient_keys: user_data keys that are never persisted.
+        """
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.flush_delay = flush_delay
+        self.transient_keys = set(transient_keys)
+        self._loaded = None  # kind -> {key: bytes}, read once on startup
+        self._pending = {}  # (kind, key) -> bytes, or None to delete
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+        self.batches_written = 0
+        self.rows_written = 0
+
+    @classmethod
+    def from_config(cls, config, connection_pool=None):
+        """
+        Builds the backend selected by the optional persistence_* keys of config.txt:
+
+            persistence=sqlite            # sqlite, postgres or none
+            persistence_path=bot_state.sqlite
+            persistence_update_interval=10
+            persistence_flush_delay=1
+
+        Returns None when persistence is disabled.
+        """
+        backend = config.get('persistence', 'sqlite').lower()
+        options = dict(
+            flush_delay=float(config.get('persistence_flush_delay', 1)),
+            update_interval=float(config.get('persistence_update_interval', 10))
+        )
+        if backend == 'sqlite':
+            return SqlitePersistence(config.get('persistence_path', 'bot_state.sqlite'), **options)
+        if backend == 'postgres':
+            if connection_pool is None:
+                logger.error("Postgres persistence needs the database connection pool.")
+                return None
+            return PostgresPersistence(connection_pool, **options)
+        if backend != 'none':
+            logger.error(f"Unknown persistence backend '{backend}', persistence disabled.")
+        return None
+
+    # ------------------------------------------------------------------
+    # Storage hooks (blocking, run in a worker thread)
+    # ------------------------------------------------------------------
+
+    def _read_rows(self):
+        """
+        Returns every stored (kind, key, data) row.
+        """
+        raise NotImplementedError
+
+    def _write_rows(self, upserts, deletes):
+        """
+        Writes one batch in a single transaction.
+
+        :param upserts: list of (kind, key, data)
+        :param deletes: list of (kind, key)
+        """
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    async def _load(self, kind):
+        if self._loaded is None:
+            rows = await asyncio.to_thread(self._read_rows)
+            self._loaded = {}
+            for row_kind, key, data in rows:
+                self._loaded.setdefault(row_kind, {})[key] = bytes(data)
+            logger.info(f"Loaded {len(rows)} persisted entries.")
+        return self._loaded.get(kind, {})
+
+    @staticmethod
+    def _loads(kind, key, data):
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            logger.error(f"Dropping unreadable persisted {kind} entry {key}: {e}")
+            return None
+
+    def _dumps(self, kind, key, data):
+        try:
+            return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.error(f"Could not persist {kind} entry {key}: {e}")
+            return None
+
+    def _dumps_user_data(self, user_id, data):
+        return self._dumps(
+            'user_data', user_id,
+            {k: v for k, v in data.items() if k not in self.transient_keys}
+        )
+
+    def _queue(self, kind, key, data):
+        """
+        Records the latest value for (kind, key); a later update before the
+        batch is written simply replaces it.
+        """
+        self._pending[(kind, str(key))] = data
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_delay)
+        await self._write_pending()
+
+    async def _write_pending(self):
+        async with self._write_lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            upserts = [(kind, key, data) for (kind, key), data in batch.items() if data is not None]
+            deletes = [(kind, key) for (kind, key), data in batch.items() if data is None]
+            try:
+                await asyncio.to_thread(self._write_rows, upserts, deletes)
+                self.batches_written += 1
+                self.rows_written += len(batch)
+            except Exception as e:
+                logger.error(f"Error writing persistence batch of {len(batch)} entries: {e}")
+                # Keep them for the next batch unless newer values arrived meanwhile
+                for entry, data in batch.items():
+                    self._pending.setdefault(entry, data)
+
+    # ------------------------------------------------------------------
+    # BasePersistence API
+    # ------------------------------------------------------------------
+
+    async def get_user_data(self):
+        stored = await self._load('user_data')
+        return {int(key): self._loads('user_data', key, data) or {} for key, data in stored.items()}
+
+    async def get_chat_data(self):
+        stored = await self._load('chat_data')
+        return {int(key): self._loads('chat_data', key, data) or {} for key, data in stored.items()}
+
+    async def get_bot_data(self):
+        stored = await self._load('bot_data')
+        data = stored.get('bot_data')
+        return (self._loads('bot_data', 'bot_data', data) or {}) if data else {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        stored = await self._load(f'conversation:{name}')
+        return {
+            tuple(json.loads(key)): self._loads('conversation', key, data)
+            for key, data in stored.items()
+        }
+
+    async def update_user_data(self, user_id, data):
+        serialized = self._dumps_user_data(user_id, data)
+        if serialized is not None:
+            self._queue('user_data', user_id, serialized)
+
+    async def update_chat_data(self, chat_id, data):
+        serialized = self._dumps('chat_data', chat_id, data)
+        if serialized is not None:
+            self._queue('chat_data', chat_id, serialized)
+
+    async def update_bot_data(self, data):
+        serialized = self._dumps('bot_data', 'bot_data', data)
+        if serialized is not None:
+            self._queue('bot_data', 'bot_data', serialized)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        key = json.dumps(list(key))
+        if new_state is None:
+            self._queue(f'conversation:{name}', key, None)
+        else:
+            serialized = self._dumps('conversation', key, new_state)
+            if serialized is not None:
+                self._queue(f'conversation:{name}', key, serialized)
+
+    async def drop_user_data(self, user_id):
+        self._queue('user_data', user_id, None)
+
+    async def drop_chat_data(self, chat_id):
+        self._queue('chat_data', chat_id, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """
+        Writes whatever is still pending and closes the storage (on shutdown).
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write_pending()
+        await asyncio.to_thread(self._close)
+        logger.info(f"Persistence flushed ({self.batches_written} batches, {self.rows_written} entries written).")
+
+
+class SqlitePersistence(BatchedPersistence):
+    def __init__(self, path='bot_state.sqlite', **kwargs):
+        """
+        Persistence in a local SQLite file; needs no extra service.
+
+        :param path: Path of the SQLite database file.
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bot_persistence (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+                """
+            )
+            self._connection.commit()
+        return self._connection
+
+    def _read_rows(self):
+        with self._lock:
+            return self._connect().execute("SELECT kind, key, data FROM bot_persistence").fetchall()
+
+    def _write_rows(self, upserts, deletes):
+        with self._lock:
+            connection = self._connect()
+            with connection:  # one transaction
+                connection.executemany(
+                    "INSERT OR REPLACE INTO bot_persistence (kind, key, data) VALUES (?, ?, ?)",
+                    upserts
+                )
+                connection.executemany(
+                    "DELETE FROM bot_persistence WHERE kind = ? AND key = ?",
+                    deletes
+                )
+
+    def _close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class PostgresPersistence(BatchedPersistence):
+    def __init__(self, connection_pool, **kwargs):
+        """
+        Persistence in the bot's PostgreSQL database (table bot_persistence),
+        for deployments where the local disk does not survive a restart.
+
+        :param connection_pool: The ConnectionPool used by DatabaseService.
+        """
+        super().__init__(**kwargs)
+        self.connection_pool = connection_pool
+
+    def _read_rows(self):
+        with self.connection_pool.connection() as connection:
+            if not connection:
+                raise RuntimeError("no database connection")
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.bot_persistence (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data BYTEA NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, key)
+                )
+                """
+            )
+            connection.commit()
+            cursor.execute("SELECT kind, key, data FROM public.bot_persistence")
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+
+    def _write_rows(self, upserts, deletes):
+        with self.connection_pool.connection() as connection:
+            if not connection:
+                raise RuntimeError("no database connection")
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(
+                    """
+                    INSERT INTO public.bot_persistence (kind, key, data, updated_at)
+                    VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (kind, key)
+                    DO UPDATE SET data = EXCLUDED.data, updated_at = EXCLUDED.updated_at
+                    """,
+                    upserts
+                )
+                cursor.executemany(
+                    "DELETE FROM public.bot_persistence WHERE kind = %s AND key = %s",
+                    deletes
+                )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PresignedUrlCache:
+    def __init__(self, max_entries=1024, min_remaining=900):
+        """
+        Bounded LRU cache of presigned S3 URLs keyed by (bucket, key, expiration),
+        so a caller asking for a long-lived URL never gets one signed for less.
+
+        :param max_entries: Max number of URLs kept; least recently used are evicted first.
+        :param min_remaining: A cached URL is only returned while it still has at least
+                              this many seconds to live. Below that it counts as a miss,
+                              so the caller re-signs it before it actually expires.
+        """
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self._entries = OrderedDict()  # (bucket, key, expiration) -> (url, expires_at)
+        self._expirations = {}  # (bucket, key) -> expirations cached for it
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bucket, key, expires_in):
+        """
+        Returns a still-valid URL for (bucket, key) signed for 'expires_in'
+        seconds, or None on a miss.
+        """
+        entry_key = (bucket, key, expires_in)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry:
+                url, expires_at = entry
+                if expires_at - time.monotonic() >= self.min_remaining:
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return url
+                # Too close to expiry: drop it so it gets re-signed
+                self._remove(entry_key)
+            self.misses += 1
+            return None
+
+    def put(self, bucket, key, url, expires_in):
+        """
+        Stores a freshly signed URL that is valid for 'expires_in' seconds.
+        """
+        entry_key = (bucket, key, expires_in)
+        with self._lock:
+            self._entries[entry_key] = (url, time.monotonic() + expires_in)
+            self._entries.move_to_end(entry_key)
+            self._expirations.setdefault((bucket, key), set()).add(expires_in)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, bucket, key):
+        """
+        Forgets every URL for an object (e.g. after it was deleted).
+        """
+        with self._lock:
+            for expires_in in self._expirations.pop((bucket, key), ()):
+                self._entries.pop((bucket, key, expires_in), None)
+
+    def _remove(self, entry_key):
+        # Caller holds the lock
+        del self._entries[entry_key]
+        bucket, key, expires_in = entry_key
+        expirations = self._expirations.get((bucket, key))
+        if expirations is not None:
+            expirations.discard(expires_in)
+            if not expirations:
+                del self._expirations[(bucket, key)]
+
+    def stats(self):
+        """
+        Returns hit/miss counters, the hit rate and the current size.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+            }
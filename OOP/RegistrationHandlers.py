@@ -19,13 +19,17 @@ USER_MENU = 5
 ROLE_OTP_CHECK=6
 
 class RegistrationHandlers:
-    def __init__(self, db_service, translation_manager):
+    def __init__(self, db_service, translation_manager, bucket_service, media_cache=None):
         """
         :param db_service: An instance of DatabaseService for DB queries.
         :param translation_manager: An instance of TranslationManager for i18n.
+        :param bucket_service: The shared BucketService, handed to the menu handlers.
+        :param media_cache: The shared MediaCache, handed to the menu handlers.
         """
         self.db_service = db_service
         self.translation_manager = translation_manager
+        self.bucket_service = bucket_service
+        self.media_cache = media_cache
 
         # If you want to store the OTP in this class, you can do so:
 
@@ -49,7 +53,7 @@ class RegistrationHandlers:
         context.user_data['telegram_username'] = telegram_username
 
         # Check if user exists in DB
-        db_user_id, existing_username, user_language_db, user_role, classroom_id = self.db_service.check_user_exists(telegram_id)
+        db_user_id, existing_username, user_language_db, user_role, classroom_id = await self.db_service.check_user_exists(telegram_id)
         if db_user_id is not None:
             # User already exists
             context.user_data['user_id'] = db_user_id
@@ -65,7 +69,7 @@ class RegistrationHandlers:
             # If the existing user is a translator, go to translator menu
             if user_role == 'Translator':
                 # Return the translator menu state
-                translatorhandlers=TranslatorHandlers(self.db_service, self.translation_manager)
+                translatorhandlers=TranslatorHandlers(self.db_service, self.translation_manager, self.bucket_service, media_cache=self.media_cache)
                 
                 return await translatorhandlers.show_translator_menu(update, context)
             elif user_role == 'Admin':
@@ -73,7 +77,7 @@ class RegistrationHandlers:
                 
                 return await adminhandler.show_admin_menu(update, context)
             else:
-                userhandler=UserHandlers(self.db_service,self.translation_manager)
+                userhandler=UserHandlers(self.db_service, self.translation_manager, self.bucket_service, media_cache=self.media_cache)
                 
                 # Return the user menu state
                 return await userhandler.show_user_menu(update,context)
@@ -193,8 +197,8 @@ class RegistrationHandlers:
 
         # If user chose normal User role, just add them to the DB right away
         elif user_choice == user_text:
-            db_user_id = self._add_user_to_db(update, context, "User")
-            userhandler=UserHandlers(self.db_service,self.translation_manager)
+            db_user_id = await self._add_user_to_db(update, context, "User")
+            userhandler=UserHandlers(self.db_service, self.translation_manager, self.bucket_service, media_cache=self.media_cache)
                 
             if db_user_id is None:
                 await update.message.reply_text(technical_difficulty_text)
@@ -229,12 +233,12 @@ class RegistrationHandlers:
         True_OTP_code=context.bot_data.get('latest_otp')
         if user_otp_input == str(True_OTP_code):
             # OTP is correct, add the user as a Translator
-            db_user_id = self._add_user_to_db(update, context, "Translator")
+            db_user_id = await self._add_user_to_db(update, context, "Translator")
             if db_user_id is None:
                 await update.message.reply_text(technical_difficulty_text)
                 return -1
             # If successful, proceed to translator menu
-            translatorhandler=TranslatorHandlers(self.db_service,self.translation_manager)
+            translatorhandler=TranslatorHandlers(self.db_service, self.translation_manager, self.bucket_service, media_cache=self.media_cache)
             return await translatorhandler.show_translator_menu(update, context)
         else:
             # OTP incorrect
@@ -251,7 +255,7 @@ class RegistrationHandlers:
             # Send them back to role selection or re-ask the OTP, your choice:
             return ROLE_SELECTION
 
-    def _add_user_to_db(self, update, context, role_value):
+    async def _add_user_to_db(self, update, context, role_value):
         """
         Private helper that adds the user to the DB with the given role (User/Translator).
         """
@@ -259,7 +263,7 @@ class RegistrationHandlers:
         language = context.user_data.get('language', 'Azerbaijani')
         telegram_id = context.user_data.get('telegram_id')
 
-        db_user_id = self.db_service.add_new_user(username, language, role_value, telegram_id)
+        db_user_id = await self.db_service.add_new_user(username, language, role_value, telegram_id)
         if db_user_id is not None:
             context.user_data['user_id'] = db_user_id
             context.user_data['role'] = role_value
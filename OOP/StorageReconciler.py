@@ -0,0 +1,203 @@
+import asyncio
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIDEO_BASE_URL = 'https://vesilebucket.s3.amazonaws.com/sign-language-videos/'
+
+
+class StorageReconciler:
+    def __init__(self, db_service, bucket_service, prefix=DEFAULT_VIDEO_BASE_URL, min_age=86400,
+                 chunk_size=1000, max_deletes=1000, dry_run=True):
+        """
+        Finds S3 objects no 'videos' row points at (orphans, e.g. left behind
+        by cascading deletes) and 'videos' rows whose object is missing
+        (dangling rows).
+
+        Both sides are walked in byte order, chunk_size entries at a time (S3
+        listing pages / keyset pages of file_path), and merged like two sorted
+        files, so memory stays bounded however many videos exist. Orphans are
+        removed with multi-object deletes, after their video_objects entries
+        (so no upload is deduplicated onto them). Dangling rows are reported,
+        and their video_objects entries flagged missing.
+
+        :param db_service: The (async) DatabaseService.
+        :param bucket_service: The shared BucketService.
+        :param prefix: URL prefix of the video objects to reconcile.
+        :param min_age: Objects younger than this (seconds) are never deleted, as
+                        their row may not be written yet (uploads finish first).
+        :param chunk_size: Entries fetched per listing page / DB query, and max
+                           keys per delete request.
+        :param max_deletes: Max orphans deleted per run; more than that is more
+                            likely a misconfigured prefix than real garbage.
+        :param dry_run: Only report, change nothing (default; deleting needs dry_run=False).
+        """
+        self.db_service = db_service
+        self.bucket_service = bucket_service
+        self.prefix = prefix if prefix.endswith('/') else prefix + '/'
+        self.min_age = min_age
+        self.chunk_size = chunk_size
+        self.max_deletes = max_deletes
+        self.dry_run = dry_run
+        self._running = False
+
+    @classmethod
+    def from_config(cls, db_service, bucket_service, config):
+        """
+        Builds a StorageReconciler from the optional reconcile_* keys of config.txt:
+
+            reconcile_interval=0         # seconds between runs (0, the default, disables; read by MainApp)
+            reconcile_min_age=86400
+            reconcile_max_deletes=1000
+            reconcile_dry_run=true       # set to false to actually delete orphans
+
+        The objects checked are those under video_base_url.
+        """
+        return cls(
+            db_service,
+            bucket_service,
+            prefix=config.get('video_base_url', DEFAULT_VIDEO_BASE_URL),
+            min_age=float(config.get('reconcile_min_age', 86400)),
+            max_deletes=int(config.get('reconcile_max_deletes', 1000)),
+            dry_run=config.get('reconcile_dry_run', 'true').lower() != 'false'
+        )
+
+    async def run(self, context=None):
+        """
+        One reconciliation pass; usable as a job_queue callback.
+        Returns the report dict (also logged), or None if the pass was
+        skipped or aborted.
+        """
+        if self._running:
+            logger.warning("Storage reconciliation still running, skipping this run.")
+            return None
+        self._running = True
+        try:
+            report = await self._reconcile()
+        except Exception as e:
+            logger.error(f"Storage reconciliation aborted: {e}")
+            return None
+        finally:
+            self._running = False
+        logger.info(f"Storage reconciliation: {report}")
+        return report
+
+    async def _objects(self):
+        """
+        Yields (file_path_url, last_modified) of every object under the prefix, in key order.
+        """
+        pages = self.bucket_service.list_object_pages(self.prefix, self.chunk_size)
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                return
+            for item in page:
+                yield item
+
+    async def _paths(self):
+        """
+        Yields every distinct videos.file_path under the prefix, in byte order.
+        """
+        after = None
+        while True:
+            paths = await self.db_service.get_file_paths_page(self.prefix, after, self.chunk_size)
+            if paths is None:
+                # Treating a failed query as "no rows" would mark every object an orphan
+                raise RuntimeError("could not read video file paths")
+            for path in paths:
+                yield path
+            if len(paths) < self.chunk_size:
+                return
+            after = paths[-1]
+
+    @staticmethod
+    async def _next(iterator):
+        try:
+            return await iterator.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def _reconcile(self):
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.min_age)
+        report = {
+            'objects': 0, 'rows': 0, 'orphans': 0, 'too_new': 0,
+            'deleted': 0, 'delete_failed': 0, 'referenced_again': 0,
+            'dangling': 0, 'dangling_sample': [], 'marked_missing': 0,
+        }
+        pending = []  # orphans waiting for the next delete request
+        missing = []  # dangling paths waiting to be flagged in video_objects
+
+        objects = self._objects()
+        paths = self._paths()
+        obj = await self._next(objects)
+        path = await self._next(paths)
+        while obj is not None or path is not None:
+            if path is None or (obj is not None and obj[0] < path):
+                # Object without a row
+                report['objects'] += 1
+                report['orphans'] += 1
+                if obj[1] > cutoff:
+                    report['too_new'] += 1
+                else:
+                    pending.append(obj[0])
+                    if len(pending) >= self.chunk_size:
+                        await self._delete(pending, report)
+                obj = await self._next(objects)
+            elif obj is None or path < obj[0]:
+                # Row without an object
+                report['rows'] += 1
+                report['dangling'] += 1
+                if len(report['dangling_sample']) < 20:
+                    report['dangling_sample'].append(path)
+                missing.append(path)
+                if len(missing) >= self.chunk_size:
+                    await self._mark_missing(missing, report)
+                path = await self._next(paths)
+            else:
+                report['objects'] += 1
+                report['rows'] += 1
+                obj = await self._next(objects)
+                path = await self._next(paths)
+
+        await self._delete(pending, report)
+        await self._mark_missing(missing, report)
+        return report
+
+    async def _delete(self, pending, report):
+        """
+        Deletes (and clears) the pending orphans, within the max_deletes budget.
+        """
+        batch = pending[:max(self.max_deletes - report['deleted'] - report['delete_failed'], 0)]
+        if len(batch) < len(pending):
+            logger.warning(f"Orphan limit of {self.max_deletes} per run reached, keeping the rest for later.")
+        pending.clear()
+        if not batch or self.dry_run:
+            return
+        # Entries first: once they are gone nothing new can reference the objects
+        released = await self.db_service.release_orphaned_objects(batch)
+        if released is None:
+            raise RuntimeError("could not release orphaned video objects")
+        report['referenced_again'] += len(batch) - len(released)
+        batch = released
+        if not batch:
+            return
+        failures = await asyncio.to_thread(self.bucket_service.removeManyFromBucket, batch)
+        for url, error in failures.items():
+            logger.error(f"Could not delete orphaned object {url}: {error}")
+        report['deleted'] += len(batch) - len(failures)
+        report['delete_failed'] += len(failures)
+
+    async def _mark_missing(self, missing, report):
+        """
+        Flags (and clears) the pending dangling paths in video_objects.
+        """
+        batch = list(missing)
+        missing.clear()
+        if not batch or self.dry_run:
+            return
+        marked = await self.db_service.mark_video_objects_missing(batch, self.min_age)
+        if marked is None:
+            logger.error("Could not flag missing video objects, deduplication may still use them.")
+            return
+        report['marked_missing'] += marked
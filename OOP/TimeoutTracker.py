@@ -0,0 +1,90 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TimeoutTracker:
+    def __init__(self, resolution=0.25):
+        """
+        Lightweight replacement for one-off scheduler jobs that are almost
+        always cancelled again (like the "Bot restarted" fallback).
+
+        schedule() and cancel() are plain dict/heap operations. A single
+        sweeper task wakes up every 'resolution' seconds and runs the callbacks
+        whose deadline passed. Cancelled entries are only dropped from the dict;
+        their heap items are skipped lazily by the sweeper.
+
+        :param resolution: Sweeper tick in seconds (callbacks may fire up to
+                           this much later than requested).
+        """
+        self.resolution = resolution
+        self._deadlines = {}  # key -> (deadline, seq, callback, args)
+        self._heap = []  # (deadline, seq, key)
+        self._seq = itertools.count()
+        self._task = None
+        self.scheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+
+    def schedule(self, key, delay, callback, *args):
+        """
+        Runs 'await callback(*args)' after 'delay' seconds unless cancel(key)
+        is called first. Scheduling an existing key replaces its deadline.
+        Must be called from the running event loop.
+        """
+        seq = next(self._seq)
+        deadline = time.monotonic() + delay
+        self._deadlines[key] = (deadline, seq, callback, args)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        self.scheduled += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sweep())
+
+    def cancel(self, key):
+        """
+        Drops the pending callback for key. Returns True if one was pending.
+        """
+        if self._deadlines.pop(key, None) is None:
+            return False
+        self.cancelled += 1
+        return True
+
+    def pending(self):
+        return len(self._deadlines)
+
+    async def stop(self):
+        """
+        Stops the sweeper and forgets every pending callback.
+        """
+        self._deadlines.clear()
+        self._heap.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sweep(self):
+        while self._deadlines:
+            await asyncio.sleep(self.resolution)
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                entry = self._deadlines.get(key)
+                if entry is None or entry[1] != seq:
+                    continue  # cancelled or re-scheduled since
+                del self._deadlines[key]
+                self.fired += 1
+                asyncio.create_task(self._run(key, entry[2], entry[3]))
+            if not self._deadlines:
+                self._heap.clear()  # only stale items left
+
+    @staticmethod
+    async def _run(key, callback, args):
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error(f"Timeout callback for {key} failed: {e}")
@@ -1,20 +1,33 @@
 import os
 import json
 import logging
+import threading
+import time
+from types import MappingProxyType
 
 logger = logging.getLogger(__name__)
 
 class TranslationManager:
-    def __init__(self, translations_dir):
+    def __init__(self, translations_dir, default_code='en', reload_check_interval=5):
         """
         Initialize the TranslationManager by specifying the directory where
         translation JSON files are stored.
 
+        Every language file is read once, up front, and compiled into a
+        read-only table keyed by the language *name* stored in
+        context.user_data['language'], so a lookup is two dict gets. Keys
+        missing from a language are filled in from the default language when
+        the table is built. Edited files are picked up by reload_if_changed()
+        (file mtimes), without a restart.
+
         :param translations_dir: The directory containing language JSON files.
                                 Defaults to 'translations'.
+        :param default_code: File code used for unknown languages and missing keys.
+        :param reload_check_interval: Min seconds between two mtime checks.
         """
         self.translations_dir = translations_dir
-        self.loaded_translations = {}  # Cache for already loaded languages
+        self.default_code = default_code
+        self.reload_check_interval = reload_check_interval
         # Map your supported language names to their file codes (if needed)
         self.language_codes = {
             # 'English': 'en',
@@ -24,6 +37,46 @@ class TranslationManager:
             'Ukrainian': 'ua'
         }
 
+        self.loaded_translations = {}  # lang_code -> raw dict from the JSON file
+        self._mtimes = {}  # lang_code -> mtime of the loaded file
+        self._tables = {}  # language name -> frozen table
+        self._default_table = MappingProxyType({})
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.load_all()
+
+    def load_all(self):
+        """
+        Loads every language file and (re)builds the lookup tables.
+        """
+        for lang_code in self._language_files():
+            self._load_language_file(lang_code)
+        self._compile()
+        self._last_check = time.monotonic()
+
+    def reload_if_changed(self, force=False):
+        """
+        Reloads the language files whose mtime changed since they were loaded
+        (and files that appeared). Checks at most once per reload_check_interval
+        unless force is set. Returns the list of reloaded language codes.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_check_interval:
+            return []
+        with self._reload_lock:
+            self._last_check = now
+            changed = [
+                lang_code for lang_code in self._language_files()
+                if self._mtime(lang_code) != self._mtimes.get(lang_code)
+            ]
+            if not changed:
+                return []
+            for lang_code in changed:
+                self._load_language_file(lang_code)
+            self._compile()
+            logger.info(f"Reloaded translations: {', '.join(changed)}")
+            return changed
+
     def get_translation(self, context, key):
         """
         Retrieve the translation string for a given key, based on the user's
@@ -34,26 +87,77 @@ class TranslationManager:
         :param key: The translation key to look up in the JSON file.
         :return: The translated string, or the key itself if not found.
         """
-        # Determine the user’s language; default to 'English'
+        return self.get_table(context).get(key, key)
+
+    def get_translations(self, context, keys):
+        """
+        Retrieve several translations at once, resolving the user's language
+        only once. Handy for building menus:
+
+            menu_text, cancel_text = tm.get_translations(context, ('user_menu', 'cancel_button'))
+
+        :param keys: Iterable of translation keys.
+        :return: Tuple of translated strings, in the order of keys.
+        """
+        table = self.get_table(context)
+        return tuple(table.get(key, key) for key in keys)
+
+    def get_table(self, context):
+        """
+        Returns the read-only translation table of the user's language
+        (the default language's table for unknown languages).
+        """
         language = context.user_data.get('language', 'English')
-        # Map the language (e.g., 'English') to a file code (e.g., 'en')
-        lang_code = self.language_codes.get(language, 'en')
+        return self._tables.get(language, self._default_table)
 
-        # If this language file isn't cached yet, load it from disk
-        if lang_code not in self.loaded_translations:
-            self._load_language_file(lang_code)
+    def _language_files(self):
+        """
+        Returns the language codes that have a JSON file in translations_dir.
+        """
+        try:
+            return sorted(
+                name[:-len('.json')] for name in os.listdir(self.translations_dir)
+                if name.endswith('.json')
+            )
+        except OSError as e:
+            logger.error(f"Error listing translations directory {self.translations_dir}: {e}")
+            return []
 
-        # Return the translation for the given key, or the key if it doesn't exist
-        return self.loaded_translations[lang_code].get(key, key)
+    def _mtime(self, lang_code):
+        try:
+            return os.stat(os.path.join(self.translations_dir, f'{lang_code}.json')).st_mtime_ns
+        except OSError:
+            return None
+
+    def _compile(self):
+        """
+        Builds one frozen table per language name, with the default language's
+        strings underneath, and swaps them in with a single assignment so
+        concurrent lookups never see a half-built table.
+        """
+        default = self.loaded_translations.get(self.default_code, {})
+        default_table = MappingProxyType(dict(default))
+        tables = {}
+        for language, lang_code in self.language_codes.items():
+            translations = self.loaded_translations.get(lang_code)
+            if translations is None:
+                logger.warning(f"No translation file for '{language}' ({lang_code}), using '{self.default_code}'.")
+                tables[language] = default_table
+            else:
+                tables[language] = MappingProxyType({**default, **translations})
+        self._default_table = default_table
+        self._tables = tables
 
     def _load_language_file(self, lang_code):
         """
         Private helper method that loads (or reloads) a language file into
-        the loaded_translations cache.
+        the loaded_translations cache. A file that fails to load keeps its
+        previous contents (or an empty dict on the first load).
 
         :param lang_code: The language code (e.g., 'en', 'az', 'de').
         """
         translation_file = os.path.join(self.translations_dir, f'{lang_code}.json')
+        mtime = self._mtime(lang_code)
         try:
             with open(translation_file, 'r', encoding='utf-8') as f:
                 self.loaded_translations[lang_code] = json.load(f)
@@ -62,7 +166,7 @@ class TranslationManager:
             logger.error(f"Error loading translation file {translation_file}: {e}")
             # If the file fails to load, create an empty dict so we at least
             # have an entry for this language code.
-            self.loaded_translations[lang_code] = {}
-
-
-
+            self.loaded_translations.setdefault(lang_code, {})
+        # Remember the mtime even on failure so a broken file is not retried
+        # on every check, only after it is edited again
+        self._mtimes[lang_code] = mtime
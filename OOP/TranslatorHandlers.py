@@ -1,7 +1,7 @@
 import logging
-import os
 import re
 import datetime
+import traceback
 from cancel import cancel_restarted_message
 from telegram import (
     Update, 
@@ -14,6 +14,9 @@ from telegram.ext import (
     ConversationHandler
 )
 from admin import handle_contact_admin
+from MediaCache import MediaCache
+from VideoStore import RoutingVideoStore
+from VideoUploadMixin import VideoUploadMixin
 
 logger = logging.getLogger(__name__)
 
@@ -29,15 +32,27 @@ CLASSROOM_PASSWORD = 102
 CLASSROOM_CREATION = 103
 CLASSROOM_DELETION = 104
 
+# Voting candidates fetched per refill of a translator's voting queue
+VOTING_BATCH_SIZE = 20
 
-class TranslatorHandlers:
-    def __init__(self, db_service, translation_manager):
+
+class TranslatorHandlers(VideoUploadMixin):
+    def __init__(self, db_service, translation_manager, bucket_service, upload_queue=None, media_cache=None):
         """
         :param db_service:          Instance of your DatabaseService class.
         :param translation_manager: Instance of your TranslationManager class.
+        :param bucket_service:      The shared BucketService instance (S3 access).
+        :param upload_queue:        Optional UploadQueue; without it uploads run inline.
+        :param media_cache:         The shared MediaCache (Telegram file_ids of sent videos);
+                                    an in-memory one is used if not given.
         """
         self.db_service = db_service
         self.translation_manager = translation_manager
+        self.bucket_service = bucket_service
+        self.upload_queue = upload_queue
+        self.media_cache = media_cache or MediaCache(video_store=RoutingVideoStore.from_config(bucket_service, {}))
+        # Where videos are read, written and deleted (S3 URLs and local paths alike)
+        self.video_store = self.media_cache.video_store
 
     # --------------------------------------------------------------------------
     # MENU AND BASIC FLOWS
@@ -191,13 +206,13 @@ class TranslatorHandlers:
         classroom_name_text = self.translation_manager.get_translation(context, 'classroom_name')
         classroom_password_text = self.translation_manager.get_translation(context, 'classroom_password')
         
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         message_target = update.message or update.callback_query.message
         if not user_id:
             await message_target.reply_text("⚠️ Error: Could not retrieve user ID.")
             return await self.show_translator_menu(update, context)
 
-        classrooms = self.db_service.get_classrooms_for_user(user_id)
+        classrooms = await self.db_service.get_classrooms_for_user(user_id)
 
         # Store classroom count and list in context
         context.user_data['classroom_count'] = len(classrooms) if classrooms else 0
@@ -420,9 +435,12 @@ class TranslatorHandlers:
                 return await self.show_classrooms_menu(update, context)
 
             classroom_id = selected_classroom['classroom_id']
-            delete_success = self.db_service.delete_classroom(classroom_id)
+            delete_success, orphaned_paths = await self.db_service.delete_classroom(classroom_id)
 
             if delete_success:
+                if orphaned_paths:
+                    # Remove the classroom's videos from storage in the background
+                    context.application.create_task(self._delete_stored_videos(orphaned_paths))
                 context.user_data["selected_classroom"] = None  # ✅ Reset selection
                 success_text = f"✅ {successful_deletion_text.format(selected_classroom['classname'])}"
                 await update.message.reply_text(success_text)
@@ -484,7 +502,7 @@ class TranslatorHandlers:
         """
         Create a new classroom with the stored name and provided password.
         """
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             await update.message.reply_text("⚠️ Error: Could not retrieve user ID.")
             return await self.show_classrooms_menu(update, context)
@@ -500,7 +518,7 @@ class TranslatorHandlers:
         hashed_password = classroom_password
 
         # Insert classroom into database
-        new_classroom_id = self.db_service.create_classroom(user_id, classroom_name, hashed_password)
+        new_classroom_id = await self.db_service.create_classroom(user_id, classroom_name, hashed_password)
 
         if new_classroom_id:
             success_text = self.translation_manager.get_translation(context, 'classroom_created').format(classroom_name)
@@ -528,7 +546,7 @@ class TranslatorHandlers:
             await update.message.reply_text("⚠️ Error")
             return await self.show_translator_menu(update, context)
 
-        user_rank_data, top_5_translators = self.db_service.get_user_rank(user_id, user_role)
+        user_rank_data, top_5_translators = await self.db_service.get_user_rank(user_id, user_role)
 
         # Check if the return type is tuple (Translator) or single value (User)
        
@@ -640,7 +658,7 @@ class TranslatorHandlers:
             return await self.show_classrooms_menu(update,context)
         
         # Check if sentence already exists
-        if self.db_service.check_sentence_exists(new_sentence):
+        if await self.db_service.check_sentence_exists(new_sentence):
         # Instead of blocking, do: 
             await update.message.reply_text(sentence_exists_text)
         # either way, proceed to "please upload video"
@@ -670,42 +688,29 @@ class TranslatorHandlers:
         if user_video:
             try:
                 # ✅ Get user id
-                user_id = self._get_user_id_from_context(context, update)
+                user_id = await self._get_user_id_from_context(context, update)
                 if not user_id:
                     await update.message.reply_text(bot_restarted_text)
                     return -1
 
                 # ✅ Generate S3 file path
-                file_path = self._get_next_available_filename(update, context, role="translator")
-
-                # ✅ Download Telegram video into memory
-                telegram_file = await context.bot.get_file(user_video.file_id)
-                file_stream = BytesIO()
-                await telegram_file.download_to_memory(out=file_stream)
-                file_stream.seek(0)
+                file_path = await self._get_next_available_filename(update, context, role="translator")
+                if not file_path:
+                    await update.message.reply_text(self.translation_manager.get_translation(context, 'upload_failed'))
+                    return await self.show_translator_menu(update, context)
 
-                # ✅ Upload video to S3 using the same working logic as in UserHandler
-                BucketService.addToBucket(file_stream, file_path)
-    
-                # ✅ Save metadata in DB
+                # ✅ Metadata saved in DB once the upload is done
                 user_language = context.user_data.get('language', 'English')
                 sentence = context.user_data.get('sentence')
-
+                video_info = dict(user_id=user_id, language=user_language, sentence=sentence)
                 if classroom_id:
-                    self.db_service.save_video_info(
-                        user_id=user_id,
-                        file_path=file_path,
-                        language=user_language,
-                        sentence=sentence,
-                        classroom_id=classroom_id
-                    )
-                else:
-                    self.db_service.save_video_info(
-                        user_id=user_id,
-                        file_path=file_path,
-                        language=user_language,
-                        sentence=sentence
-                    )
+                    video_info['classroom_id'] = classroom_id
+
+                # ✅ Stream Telegram video to S3 in the background, same as in UserHandler
+                telegram_file = await context.bot.get_file(user_video.file_id)
+                if not await self._queue_video_upload(context, update.effective_chat.id, telegram_file, file_path, video_info):
+                    await update.message.reply_text(self.translation_manager.get_translation(context, 'upload_failed'))
+                    return await self.show_translator_menu(update, context)
 
                 # ✅ Confirm upload
                 await update.message.reply_text(thank_you_video_text)
@@ -739,12 +744,10 @@ class TranslatorHandlers:
         page = context.user_data.get('current_page', 1)
         language = context.user_data.get('language', 'English')
 
-        if classroom_id:
-            sentences = self.db_service.get_classroom_sentences(classroom_id, language)
-        else:
-            sentences = self.db_service.get_all_sentences(language)
+        # Only the (cached) total and the requested page are read from the DB
+        total_sentences = await self.db_service.count_sentences(language, classroom_id=classroom_id)
         items_per_page = 10
-        total_pages = (len(sentences) + items_per_page - 1) // items_per_page  # Calculate total pages
+        total_pages = (total_sentences + items_per_page - 1) // items_per_page  # Calculate total pages
 
         # Prevent invalid page numbers
         if page < 1:
@@ -755,10 +758,11 @@ class TranslatorHandlers:
         # Store the page in context
         context.user_data['current_page'] = page
 
-        # Extract the current page's sentences
+        # Fetch the current page's sentences
         start_idx = (page - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        current_sentences = sentences[start_idx:end_idx]
+        current_sentences = await self.db_service.get_sentences_page(
+            language, page=page, per_page=items_per_page, classroom_id=classroom_id
+        ) if total_sentences else []
 
         if not current_sentences:
             message = self.translation_manager.get_translation(context, 'no_sentences_found')
@@ -831,7 +835,7 @@ class TranslatorHandlers:
         """
         cancel_restarted_message(context)
 
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             await update.message.reply_text("Bot restarted or user not found.")
             return ConversationHandler.END
@@ -841,7 +845,7 @@ class TranslatorHandlers:
         # Single DB call - no repetitive queries here!
         selected_classroom = context.user_data.get("selected_classroom")
         classroom_id = selected_classroom["classroom_id"] if selected_classroom else None
-        results = self.db_service.get_translator_videos(user_id, language, classroom_id) if classroom_id else self.db_service.get_translator_videos(user_id, language) 
+        results = await self.db_service.get_translator_videos(user_id, language, classroom_id) if classroom_id else await self.db_service.get_translator_videos(user_id, language) 
         if not results:
             no_sentences_text = self.translation_manager.get_translation(context, 'no_sentences_found')
             await update.message.reply_text(no_sentences_text)
@@ -1029,11 +1033,13 @@ class TranslatorHandlers:
             f"{item['sentence']}\n"
             f"Up votes: {item['upvotes']}  Down votes: {item['downvotes']}"
         )
-        # If video file exists, send it
-        if item['video_path'] and os.path.exists(item['video_path']):
-            with open(item['video_path'], 'rb') as f:
-                await query.message.reply_video(f, caption=caption, reply_markup=keyboard)
-        else:
+        # If the video exists, send it (by cached file_id when Telegram already has it)
+        sent = None
+        if item['video_path']:
+            sent = await self.media_cache.reply_video(
+                query.message, item['video_path'], caption=caption, reply_markup=keyboard
+            )
+        if not sent:
             video_not_found_text = self.translation_manager.get_translation(context, 'video_not_found')
             await query.message.reply_text(f"{caption}\n\n{video_not_found_text}", reply_markup=keyboard)
 
@@ -1057,8 +1063,12 @@ class TranslatorHandlers:
 
         # 3) Call the “universal” function that decides whether to remove just the one video
         #    or remove the entire sentence row if there is only that single referencing video
-        user_id = self._get_user_id_from_context(context, update)
-        self.db_service.delete_sentence_and_video(sentence_id, user_id, video_id)
+        user_id = await self._get_user_id_from_context(context, update)
+        orphaned_path = await self.db_service.delete_sentence_and_video(sentence_id, user_id, video_id)
+        # Remove the stored object from the bucket once no other video uses it
+        if orphaned_path:
+            await self.video_store.delete(orphaned_path)
+            await self.media_cache.invalidate(orphaned_path)
 
         # 4) Remove from local memory
         new_list = [x for x in old_list if x['video_id'] != video_id]
@@ -1124,7 +1134,7 @@ class TranslatorHandlers:
         Fetch the next random video not uploaded by the translator, not yet voted on by them.
         Display it with up/down vote buttons.
         """
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await update.message.reply_text(bot_restarted_text)
@@ -1136,18 +1146,14 @@ class TranslatorHandlers:
         up_vote_text = self.translation_manager.get_translation(context, 'up_vote')
         down_vote_text = self.translation_manager.get_translation(context, 'down_vote')
 
-        # Attempt to fetch a random video for voting
+        # Attempt to fetch the next video for voting
         try:
-            video_info = self.db_service.get_random_video_for_voting(user_id, user_language)
+            video_info = await self._next_voting_video(context, user_id, user_language)
             if video_info is None:
                 await update.message.reply_text(no_more_videos_text)
                 return TRANSLATOR_MENU
 
             (video_id, file_path, sentence_content) = video_info
-            if not os.path.exists(file_path):
-                logger.error(f"Voting video not found: {file_path}")
-                await update.message.reply_text("Video file missing. Try again.")
-                return await self.show_translator_menu(update, context)
 
             # Store the current video id for reference
             context.user_data['current_voting_video_id'] = video_id
@@ -1162,19 +1168,49 @@ class TranslatorHandlers:
             keyboard = InlineKeyboardMarkup(buttons)
             message_target = update.message or update.callback_query.message
             # Send the video + voting keyboard
-            with open(file_path, 'rb') as video_file:
-                sent_message = await message_target.reply_video(
-                    video_file,
-                    caption=voting_sentence_text.format(sentence_content),
-                    reply_markup=keyboard
-                )
-                context.user_data['current_voting_message_id'] = sent_message.message_id
+            sent_message = await self.media_cache.reply_video(
+                message_target,
+                file_path,
+                caption=voting_sentence_text.format(sentence_content),
+                reply_markup=keyboard
+            )
+            if sent_message is None:
+                logger.error(f"Voting video not found: {file_path}")
+                await message_target.reply_text("Video file missing. Try again.")
+                return await self.show_translator_menu(update, context)
+            context.user_data['current_voting_message_id'] = sent_message.message_id
 
             return VOTING
         except Exception as e:
             logger.error(f"Error in send_next_video_for_voting: {e}")
             return await self.show_translator_menu(update, context)
 
+    async def _next_voting_video(self, context, user_id, user_language):
+        """
+        Pops the next candidate from the translator's voting queue in
+        context.user_data['voting_queue'], refilling it with a batch of
+        VOTING_BATCH_SIZE candidates when empty (or when the language changed).
+        Returns (video_id, file_path, sentence_content) or None.
+        """
+        queue = context.user_data.get('voting_queue')
+        if not queue or queue['language'] != user_language or not queue['items']:
+            # Votes are stored right away, so the anti-join already skips voted videos;
+            # only the one on screen (maybe not voted yet) has to be left out.
+            current_video_id = context.user_data.get('current_voting_video_id')
+            items = await self.db_service.get_voting_candidates(
+                user_id,
+                user_language,
+                limit=VOTING_BATCH_SIZE,
+                exclude_ids=[current_video_id] if current_video_id else None
+            )
+            # Stored reversed so pop() keeps the order (matters for fewest_votes)
+            queue = {'language': user_language, 'items': items[::-1]}
+            context.user_data['voting_queue'] = queue
+
+        if not queue['items']:
+            return None
+        return queue['items'].pop()
+
     async def handle_voting_response(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         cancel_restarted_message(context)
         """
@@ -1182,7 +1218,7 @@ class TranslatorHandlers:
         Otherwise, you can rely purely on callback queries with handle_vote_up / handle_vote_down.
         """
         user_input = update.message.text
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await update.message.reply_text(bot_restarted_text)
@@ -1199,12 +1235,11 @@ class TranslatorHandlers:
         go_back_text = self.translation_manager.get_translation(context, 'go_back')
         invalid_option_text = self.translation_manager.get_translation(context, 'invalid_option')
 
-        if user_input == up_vote_text:
-            self.db_service.increment_video_score(video_id, 'positive_scores')
-            self.db_service.record_vote(user_id, video_id, 'up')
-        elif user_input == down_vote_text:
-            self.db_service.increment_video_score(video_id, 'negative_scores')
-            self.db_service.record_vote(user_id, video_id, 'down')
+        if user_input in (up_vote_text, down_vote_text):
+            vote_type = 'up' if user_input == up_vote_text else 'down'
+            _, stored_vote_type = await self.db_service.cast_vote(user_id, video_id, vote_type)
+            if stored_vote_type and stored_vote_type != vote_type:
+                await update.message.reply_text(self.translation_manager.get_translation(context, 'already_voted'))
         elif user_input == go_back_text:
             return await self.show_translator_menu(update, context)
         else:
@@ -1232,7 +1267,7 @@ class TranslatorHandlers:
         query = update.callback_query
         await query.answer()
 
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await query.message.reply_text(bot_restarted_text)
@@ -1244,9 +1279,10 @@ class TranslatorHandlers:
             await query.message.reply_text(voting_error_text)
             return TRANSLATOR_MENU
 
-        # Record up vote
-        self.db_service.increment_video_score(video_id, 'positive_scores')
-        self.db_service.record_vote(user_id, video_id, 'up')
+        # Record up vote (vote + score in one statement)
+        _, stored_vote_type = await self.db_service.cast_vote(user_id, video_id, 'up')
+        if stored_vote_type and stored_vote_type != 'up':
+            await query.message.reply_text(self.translation_manager.get_translation(context, 'already_voted'))
 
         await query.message.delete()
 
@@ -1264,7 +1300,7 @@ class TranslatorHandlers:
         query = update.callback_query
         await query.answer()  # Acknowledge the callback
 
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await query.message.reply_text(bot_restarted_text)
@@ -1276,21 +1312,28 @@ class TranslatorHandlers:
             await query.message.reply_text(voting_error_text)
             return await self.show_translator_menu(update, context)
 
-        # 2) Increment negative score
-        self.db_service.increment_video_score(video_id, 'negative_scores')
-
-        # 3) Insert the 'down' vote and retrieve the newly created vote_id
-        vote_id = self.db_service.record_vote(user_id, video_id, 'down')
+        # 2) Insert the 'down' vote + increment negative score, get the vote_id
+        #    (the existing one if this was a double-tap)
+        vote_id, stored_vote_type = await self.db_service.cast_vote(user_id, video_id, 'down')
+        if vote_id is None:
+            voting_error_text = self.translation_manager.get_translation(context, 'voting_error')
+            await query.message.reply_text(voting_error_text)
+            return await self.show_translator_menu(update, context)
+        if stored_vote_type != 'down':
+            # Voted up on this video before: no feedback to attach to that vote
+            await query.message.reply_text(self.translation_manager.get_translation(context, 'already_voted'))
+            await query.message.delete()
+            return await self.send_next_video_for_voting(update, context)
 
-        # 4) Save vote_id to context so we can update its feedback later
+        # 3) Save vote_id to context so we can update its feedback later
         context.user_data['current_vote_id'] = vote_id
 
-        # 5) Prompt user for feedback
+        # 4) Prompt user for feedback
         downvote_feedback_prompt = self.translation_manager.get_translation(context, 'downvote_feedback_prompt')
         # (You can translate the prompt_text as needed)
         await query.message.reply_text(downvote_feedback_prompt)
 
-        # 6) Return a new state: WAITING_FOR_FEEDBACK
+        # 5) Return a new state: WAITING_FOR_FEEDBACK
         return WAITING_FOR_FEEDBACK
 
 
@@ -1310,7 +1353,7 @@ class TranslatorHandlers:
             return await self.show_translator_menu(update, context)
 
         # 2) Update the DB with the feedback
-        self.db_service.update_vote_feedback(vote_id, user_feedback)
+        await self.db_service.update_vote_feedback(vote_id, user_feedback)
 
         # 3) Clean up the context
         del context.user_data['current_vote_id']
@@ -1357,7 +1400,7 @@ class TranslatorHandlers:
     # INTERNAL / HELPER METHODS
     # --------------------------------------------------------------------------
 
-    def _get_user_id_from_context(self, context, update) -> int:
+    async def _get_user_id_from_context(self, context, update) -> int:
         """
         Retrieves user_id from context, or tries to fetch from DB if not in context.
         """
@@ -1369,45 +1412,28 @@ class TranslatorHandlers:
         if not telegram_id:
             return None
 
-        db_user_id, _, _, _ = self.db_service.check_user_exists(telegram_id)
+        db_user_id, _, _, _, _ = await self.db_service.check_user_exists(telegram_id)
         if db_user_id:
             context.user_data['user_id'] = db_user_id
             return db_user_id
         return None
 
-    def _get_next_available_filename(self, update, context, role="translator"):
+    async def _get_next_available_filename(self, update, context, role="translator"):
         """
-        A direct port of your 'get_next_available_filename' logic, 
-        but we choose the directory based on 'role'.
+        Returns the S3 URL for the next video of this translator,
+        allocated by the database so concurrent uploads never collide.
         """
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         username = context.user_data.get('username', 'unknown')
+        return await self.db_service.allocate_video_file_path(user_id, username, role)
 
-        if role.lower() == "translator":
-            directory = "/home/ubuntu/Sign_Language_System/Video/Translator"
-        else:
-            directory = "/home/ubuntu/Sign_Language_System/Video/User"
-
-        os.makedirs(directory, exist_ok=True)
-
-        prefix = f"{role.lower()}_video_{user_id}_{username}_"
-        existing_files = [f for f in os.listdir(directory) if f.startswith(prefix)]
-
-        max_number = 0
-        for file in existing_files:
-            match = re.search(rf"{prefix}(\d+)\.mp4", file)
-            if match:
-                file_number = int(match.group(1))
-                max_number = max(max_number, file_number)
-
-        next_number = max_number + 1
-        return os.path.join(directory, f"{prefix}{next_number}.mp4")
-
-    async def _download_video(self, video, file_path, context):
+    async def _delete_stored_videos(self, file_paths):
         """
-        Download the given Telegram video to local storage.
+        Removes video objects no row uses any more, with batched deletes.
         """
-        new_file = await context.bot.get_file(video.file_id)
-        await new_file.download_to_drive(file_path)
-
-
+        failures = await self.video_store.delete_many(file_paths)
+        for file_path, error in failures.items():
+            logger.error(f"Could not delete stored video {file_path}: {error}")
+        for file_path in file_paths:
+            await self.media_cache.invalidate(file_path)
+        logger.info(f"Deleted {len(file_paths) - len(failures)} of {len(file_paths)} stored videos")
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates=32):
+        """
+        Processes updates from different chats concurrently while updates of
+        the same chat run one at a time, in arrival order. That keeps
+        ConversationHandler states and user_data consistent per chat, but a
+        slow handler (e.g. an upload) only delays its own chat.
+
+        :param max_concurrent_updates: Global limit of updates being handled at once.
+        """
+        super().__init__(max_concurrent_updates)
+        self._limit = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._chat_locks = {}  # chat key -> [asyncio.Lock, number of updates holding/waiting]
+
+    @staticmethod
+    def _chat_key(update):
+        """
+        The ordering key of an update: its chat, or its user for chat-less
+        updates (e.g. inline queries). None means no ordering is needed.
+        """
+        chat = getattr(update, 'effective_chat', None)
+        if chat is not None:
+            return chat.id
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return ('user', user.id)
+        return None
+
+    async def process_update(self, update, coroutine):
+        """
+        Waits for earlier updates of the same chat first, and only then for a
+        global slot, so a burst from one chat does not tie up the global limit.
+        """
+        key = self._chat_key(update)
+        if key is None:
+            async with self._limit:
+                await self.do_process_update(update, coroutine)
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._limit:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._chat_locks:
+            logger.info(f"Update processor shutting down with {len(self._chat_locks)} chats still busy.")
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class UploadJob:
+    def __init__(self, telegram_file, file_path_url, on_complete, on_failure=None, find_duplicate=None):
+        """
+        One queued upload.
+
+        :param telegram_file: telegram.File to stream into S3.
+        :param file_path_url: Full S3 URL of the object to create.
+        :param on_complete: async callable(UploadResult) run after a successful upload
+                            (e.g. a closure calling save_video_info).
+        :param on_failure: optional async callable(error) run when all attempts failed,
+                           or when on_complete raised.
+        :param find_duplicate: optional async callable(content_hash), see
+                               VideoStore.put.
+        """
+        self.telegram_file = telegram_file
+        self.file_path_url = file_path_url
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self.find_duplicate = find_duplicate
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class UploadQueue:
+    def __init__(self, video_store, max_size=100, workers=4, max_attempts=3,
+                 base_delay=1.0, max_delay=30.0, submit_timeout=10.0):
+        """
+        Bounded background pipeline that moves S3 uploads off the handlers.
+
+        :param video_store: The VideoStore uploads are written to.
+        :param max_size: Max jobs waiting in the queue. When full, submit() waits
+                         (backpressure) for up to submit_timeout seconds.
+        :param workers: Number of concurrent upload workers.
+        :param max_attempts: Attempts per job before on_failure is called.
+        :param base_delay: Base of the exponential backoff between attempts (seconds).
+        :param max_delay: Cap for a single backoff delay (seconds).
+        :param submit_timeout: Seconds submit() waits for room before rejecting a job.
+        """
+        self.video_store = video_store
+        self.max_size = max_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.submit_timeout = submit_timeout
+
+        self._queue = None
+        self._tasks = []
+
+        # Metrics
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.deduplicated = 0  # uploads that turned out to be stored already
+        self.deduplicated_bytes = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0  # exponentially weighted, seconds from submit to done
+
+    @classmethod
+    def from_config(cls, video_store, config):
+        """
+        Builds an UploadQueue from the optional upload_* keys of config.txt:
+
+            upload_queue_size=100
+            upload_workers=4
+            upload_max_attempts=3
+        """
+        return cls(
+            video_store,
+            max_size=int(config.get('upload_queue_size', 100)),
+            workers=int(config.get('upload_workers', 4)),
+            max_attempts=int(config.get('upload_max_attempts', 3))
+        )
+
+    async def start(self):
+        """
+        Creates the queue and spawns the workers. Call from the running event loop.
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Upload queue started with {self.workers} workers (max {self.max_size} queued).")
+
+    async def stop(self):
+        """
+        Waits for queued uploads to finish, then stops the workers.
+        """
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Upload queue stopped.")
+
+    async def submit(self, telegram_file, file_path_url, on_complete, on_failure=None, find_duplicate=None):
+        """
+        Queues an upload and returns as soon as it is accepted.
+        Returns False if the queue stayed full for submit_timeout seconds.
+        """
+        job = UploadJob(telegram_file, file_path_url, on_complete, on_failure, find_duplicate)
+        try:
+            await asyncio.wait_for(self._queue.put(job), timeout=self.submit_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            logger.warning(f"Upload queue full, rejected {file_path_url}")
+            return False
+
+    def metrics(self):
+        """
+        Snapshot of queue depth, throughput counters and latency.
+        """
+        return {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'retries': self.retries,
+            'deduplicated': self.deduplicated,
+            'deduplicated_bytes': self.deduplicated_bytes,
+            'last_latency': self.last_latency,
+            'avg_latency': self.avg_latency,
+        }
+
+    def _backoff(self, attempt):
+        """
+        Exponential backoff with full jitter, so retries from many workers spread out.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _worker(self, worker_id):
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Upload worker {worker_id} failed on {job.file_path_url}: {e}")
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _process(self, job):
+        while True:
+            job.attempts += 1
+            try:
+                result = await self.video_store.put_telegram_file(
+                    job.telegram_file, job.file_path_url, job.find_duplicate
+                )
+                break
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    self.failed += 1
+                    logger.error(f"Upload of {job.file_path_url} failed after {job.attempts} attempts: {e}")
+                    if job.on_failure:
+                        await job.on_failure(e)
+                    return
+                self.retries += 1
+                delay = self._backoff(job.attempts)
+                logger.warning(f"Upload of {job.file_path_url} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        if result.duplicate:
+            self.deduplicated += 1
+            self.deduplicated_bytes += result.size
+        try:
+            await job.on_complete(result)
+        except Exception as e:
+            # Stored, but not recorded (e.g. the DB save failed): the user must
+            # hear about it; the unreferenced object is left to StorageReconciler
+            self.failed += 1
+            logger.error(f"Saving the upload {result.file_path} failed: {e}")
+            if job.on_failure:
+                await job.on_failure(e)
+            return
+        self.completed += 1
+        self.last_latency = time.monotonic() - job.enqueued_at
+        self.avg_latency = self.last_latency if self.completed == 1 else 0.8 * self.avg_latency + 0.2 * self.last_latency
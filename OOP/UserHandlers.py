@@ -1,11 +1,8 @@
-from io import BytesIO
 import logging
-import os
 import re
 from telegram import (
     Update, 
     ReplyKeyboardMarkup, 
-    InputMediaVideo,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
    
@@ -14,10 +11,12 @@ from telegram.ext import (
     ContextTypes,
     ConversationHandler
 )
-from BucketService import BucketService
 from cancel import cancel_restarted_message
 from telegram.ext import ContextTypes
 from admin import handle_contact_admin
+from MediaCache import MediaCache
+from VideoStore import RoutingVideoStore
+from VideoUploadMixin import VideoUploadMixin
 logger = logging.getLogger(__name__)
 
 # Example conversation states (import or define them as needed)
@@ -27,16 +26,33 @@ USER_REQUEST = 12
 CLASS_PASSWORD = 13
 JOIN_CLASSROOM = 14
 
-class UserHandlers:
-    def __init__(self, db_service, translation_manager):
+# Translator videos fetched per refill of a user's prefetch queue
+VIDEO_QUEUE_SIZE = 20
+
+# (user video, translator video) pairs loaded per window in "View your videos"
+VIDEO_WINDOW_SIZE = 10
+
+INSTRUCTION_VIDEO_PATH = '/home/ubuntu/Sign_Language_System/assets/instruction.mp4'
+
+class UserHandlers(VideoUploadMixin):
+    def __init__(self, db_service, translation_manager, bucket_service, upload_queue=None, media_cache=None):
         """
         :param db_service:   An instance of your DatabaseService class
                              (for all DB queries).
         :param translation_manager: An instance of your TranslationManager class
                              for retrieving localized strings.
+        :param bucket_service: The shared BucketService instance (S3 access).
+        :param upload_queue: Optional UploadQueue; without it uploads run inline.
+        :param media_cache:  The shared MediaCache (Telegram file_ids of sent videos);
+                             an in-memory one is used if not given.
         """
         self.db_service = db_service
         self.translation_manager = translation_manager
+        self.bucket_service = bucket_service
+        self.upload_queue = upload_queue
+        self.media_cache = media_cache or MediaCache(video_store=RoutingVideoStore.from_config(bucket_service, {}))
+        # Where videos are read, written and deleted (S3 URLs and local paths alike)
+        self.video_store = self.media_cache.video_store
 
     async def show_user_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """
@@ -45,14 +61,12 @@ class UserHandlers:
           - View your own videos
           - Cancel / go back
         """
-        user_menu_text = self.translation_manager.get_translation(context, 'user_menu')
-        request_video_text = self.translation_manager.get_translation(context, 'request_video')
-        view_videos_text = self.translation_manager.get_translation(context, 'view_videos')
-        contact_admin_text =  self.translation_manager.get_translation(context, 'contact_admin')
-        cancel_text = self.translation_manager.get_translation(context, 'cancel_button')
-        user_buttons_info =  self.translation_manager.get_translation(context, 'user_info')
-        show_my_rank_text = self.translation_manager.get_translation(context, 'show_my_rank')
-        join_classroom_text = self.translation_manager.get_translation(context, 'join_classroom')
+        (user_menu_text, request_video_text, view_videos_text, contact_admin_text,
+         cancel_text, user_buttons_info, show_my_rank_text, join_classroom_text) = self.translation_manager.get_translations(
+            context,
+            ('user_menu', 'request_video', 'view_videos', 'contact_admin',
+             'cancel_button', 'user_info', 'show_my_rank', 'join_classroom')
+        )
 
         if context.user_data.get('classroom_view', False):
             # User is viewing the classroom
@@ -93,8 +107,7 @@ class UserHandlers:
             
             # Send the video first
             try:
-                with open('/home/ubuntu/Sign_Language_System/assets/instruction.mp4', 'rb') as video:
-                    await message.reply_video(video)
+                await self.media_cache.reply_video(message, INSTRUCTION_VIDEO_PATH)
             except Exception as e:
                 logger.error(f"Error sending instruction video: {e}")
 
@@ -117,20 +130,22 @@ class UserHandlers:
         - 'Cancel' -> e.g., end or go back
         """
         user_choice = update.message.text
-        request_video_text = self.translation_manager.get_translation(context, 'request_video')
-        view_videos_text = self.translation_manager.get_translation(context, 'view_videos')
-        cancel_text = self.translation_manager.get_translation(context, 'cancel_button')
-        contact_admin_text =  self.translation_manager.get_translation(context, 'contact_admin')
-        go_back_text = self.translation_manager.get_translation(context, 'go_back')
-        show_my_rank_text = self.translation_manager.get_translation(context, 'show_my_rank')
-        user_buttons_info =  self.translation_manager.get_translation(context, 'user_info')
-        join_classroom_text = self.translation_manager.get_translation(context, 'join_classroom')
-        open_classroom = self.translation_manager.get_translation(context, 'open_classroom')
-        close_classroom = self.translation_manager.get_translation(context, 'go_back_to_main_menu')
-        remove_classroom = self.translation_manager.get_translation(context, 'remove_classroom')
+        (request_video_text, view_videos_text, cancel_text, contact_admin_text, go_back_text,
+         show_my_rank_text, user_buttons_info, join_classroom_text, open_classroom,
+         close_classroom, remove_classroom) = self.translation_manager.get_translations(
+            context,
+            ('request_video', 'view_videos', 'cancel_button', 'contact_admin', 'go_back',
+             'show_my_rank', 'user_info', 'join_classroom', 'open_classroom',
+             'go_back_to_main_menu', 'remove_classroom')
+        )
         
         if user_choice == request_video_text:
-            context.user_data['skipped_videos']=set()
+            # New request session: videos skipped in the previous one come back
+            user_id = await self._get_user_id_from_context(context, update)
+            if user_id:
+                await self.db_service.clear_translator_video_skips(user_id)
+            context.user_data.pop('skipped_videos', None)
+            context.user_data.pop('video_queue', None)
             return await self.handle_user_flow(update, context)
         elif user_choice == open_classroom:
             context.user_data['classroom_view'] = True  # Set classroom_view to True
@@ -149,9 +164,9 @@ class UserHandlers:
         elif user_choice == remove_classroom:
             success_message = self.translation_manager.get_translation(context, 'classroom_remove_success')
             failure_message = self.translation_manager.get_translation(context, 'classroom_remove_failure')
-            user_id = self._get_user_id_from_context(context, update)
+            user_id = await self._get_user_id_from_context(context, update)
             if user_id:
-                success = self.db_service.remove_user_from_classroom(user_id)
+                success = await self.db_service.remove_user_from_classroom(user_id)
                 if success:
                     context.user_data['classroom_id'] = None  # Set classroom_id to None
                     context.user_data['classroom_view'] = False  # Set classroom_view to None
@@ -225,16 +240,16 @@ class UserHandlers:
             return USER_MENU
         
         # Validate the classroom ID and password in the database
-        is_valid = self.db_service.validate_classroom_credentials(classroom_id, password)
+        is_valid = await self.db_service.validate_classroom_credentials(classroom_id, password)
         
         if is_valid:
             # If the credentials are valid, proceed to mark the user as joined
             context.user_data['classroom_id'] = classroom_id  # Store the valid classroom ID
 
             # Update the user's status in the database (set 'joined_classroom' to True)
-            user_id = self._get_user_id_from_context(context, update)  # Get the user ID from the context or DB
+            user_id = await self._get_user_id_from_context(context, update)  # Get the user ID from the context or DB
             if user_id:
-                self.db_service.update_user_classroom_status(user_id, classroom_id)
+                await self.db_service.update_user_classroom_status(user_id, classroom_id)
 
             # Success message
             success_message = self.translation_manager.get_translation(context, 'classroom_join_success')
@@ -288,18 +303,14 @@ class UserHandlers:
         prompt the user to upload a response or skip.
         """
         user_language = context.user_data.get('language', 'English')
-        skipped_videos = context.user_data.get('skipped_videos', set())
 
-        logger.info(f"Handling user flow for language: {user_language}, skipped: {skipped_videos}")
+        logger.info(f"Handling user flow for language: {user_language}")
         classroom_id = context.user_data.get('classroom_id') if context.user_data.get('classroom_view') else None
-        # Fetch a random translator video, excluding the user's own videos or skipped ones
-        file_path, sentence = self.db_service.get_random_translator_video(user_language, context, exclude_ids=skipped_videos, classroom_id=classroom_id)
+        # Next translator video from the prefetch queue (excludes own, answered and skipped ones)
+        file_path, sentence = await self._next_translator_video(update, context, user_language, classroom_id)
         if file_path:
             try:
-                bucketUrl = BucketService.view_bucket_video(file_path_url=file_path) 
-                await update.message.reply_video(
-                    video=bucketUrl
-                )
+                await self.media_cache.reply_video(update.message, file_path)
                 if sentence:
                     msg = self.translation_manager.get_translation(context, 'translated_sentence')
                     await update.message.reply_text(msg.format(sentence))
@@ -346,85 +357,56 @@ class UserHandlers:
         valid_video_error = self.translation_manager.get_translation(context, 'valid_video_error')
         bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
         thank_you_response_text = self.translation_manager.get_translation(context, 'continue_exchange')
-        no_more_videos_text = self.translation_manager.get_translation(context, 'no_more_videos')
 
         # If the user uploads a video
         if user_video:
-            user_id = self._get_user_id_from_context(context, update)
+            user_id = await self._get_user_id_from_context(context, update)
             if not user_id:
                 await update.message.reply_text(bot_restarted_text)
                 return await self.show_user_menu(update,context)  # or ConversationHandler.END
 
             # We need to store the user's response referencing the translator video
             translator_video_id = context.user_data.get('current_translator_video_id')
-            translator_text_id = self.db_service.get_video_text_id(translator_video_id)
+            translator_text_id = await self.db_service.get_video_text_id(translator_video_id)
 
             # Generate a file path and save video
-            file_path = self._get_next_available_filename(update, context, role="user")
-            # Download video to memory
-            file = await context.bot.get_file(user_video.file_id)
-            file_stream = BytesIO()
-            await file.download_to_memory(out=file_stream)
-            file_stream.seek(0)
-
-            # Upload to S3 using exact path
-            BucketService.addToBucket(file_stream, file_path)
-            
-            # Insert DB row referencing the translator video
+            file_path = await self._get_next_available_filename(update, context, role="user")
+            if not file_path:
+                await update.message.reply_text(self.translation_manager.get_translation(context, 'upload_failed'))
+                return await self.show_user_menu(update, context)
+            # DB row referencing the translator video, inserted once the upload is done
             user_language = context.user_data.get('language', 'English')
             classroom_id = context.user_data.get('classroom_id')
+            video_info = dict(
+                user_id=user_id,
+                language=user_language,
+                sentence=None,
+                reference_id=translator_video_id,
+                sentence_id=translator_text_id
+            )
             if context.user_data.get('classroom_view') and classroom_id:
-                self.db_service.save_video_info(
-                    user_id=user_id,
-                    file_path=file_path,
-                    language=user_language,
-                    sentence=None,
-                    reference_id=translator_video_id,
-                    sentence_id=translator_text_id,
-                    classroom_id=classroom_id  # Store the classroom_id for classroom-related videos
-                )
-            else:
-                self.db_service.save_video_info(
-                    user_id=user_id,
-                    file_path=file_path,
-                    language=user_language,
-                    sentence=None,
-                    reference_id=translator_video_id,
-                    sentence_id=translator_text_id
-                )
+                video_info['classroom_id'] = classroom_id  # Store the classroom_id for classroom-related videos
+
+            # Stream the video from Telegram to S3 in the background
+            file = await context.bot.get_file(user_video.file_id)
+            if not await self._queue_video_upload(context, update.effective_chat.id, file, file_path, video_info):
+                await update.message.reply_text(self.translation_manager.get_translation(context, 'upload_failed'))
+                return await self.show_user_menu(update, context)
+
+            # Its DB row lands only after the upload, so keep it out of refills until then
+            await self.db_service.skip_translator_video(user_id, translator_video_id)
 
             await update.message.reply_text(thank_you_response_text)
 
-            # Fetch next translator video
-            file_path2, sentence = self.db_service.get_random_translator_video(user_language, context, classroom_id=classroom_id)
-            if file_path2 and os.path.exists(file_path2):
-                with open(file_path2, 'rb') as video_file:
-                    await update.message.reply_video(video_file)
-                if sentence:
-                    trans_sentence_msg = self.translation_manager.get_translation(context, 'translated_sentence')
-                    await update.message.reply_text(trans_sentence_msg.format(sentence))
-                # Prompt user again
-                cancel_text = self.translation_manager.get_translation(context, 'cancel_button')
-                skip_text = self.translation_manager.get_translation(context, 'skip_button')
-                user_prompt_text = self.translation_manager.get_translation(context, 'user_prompt')
-
-                reply_keyboard = [[cancel_text, skip_text]]
-                await update.message.reply_text(
-                    user_prompt_text,
-                    reply_markup=ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True, one_time_keyboard=True)
-                )
-                return USER_REQUEST
-            else:
-                await update.message.reply_text(no_more_videos_text)
-                return await self.show_user_menu(update,context)
+            # Show the next translator video from the queue
+            return await self.handle_user_flow(update, context)
 
         elif user_input == skip_text:
             # Mark current video as "skipped"
             current_video_id = context.user_data.get('current_translator_video_id')
-            if current_video_id:
-                skipped_videos = context.user_data.get('skipped_videos', set())
-                skipped_videos.add(current_video_id)
-                context.user_data['skipped_videos'] = skipped_videos
+            user_id = await self._get_user_id_from_context(context, update)
+            if current_video_id and user_id:
+                await self.db_service.skip_translator_video(user_id, current_video_id)
                 logger.info(f"Skipped video ID: {current_video_id}")
 
             # Fetch next video
@@ -443,23 +425,26 @@ class UserHandlers:
         Shows a paginated list of the user's own videos + the corresponding translator videos.
         Then calls display_current_user_video_group to show them in pairs.
         """
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await update.message.reply_text(bot_restarted_text)
             return -1
 
-        user_videos = self.db_service.get_user_videos_and_translator_videos(user_id)
+        total_videos = await self.db_service.count_user_videos(user_id)
         no_uploaded_videos_text = self.translation_manager.get_translation(context, 'no_uploaded_videos')
         edit_menu_prompt_text = self.translation_manager.get_translation(context, 'edit_menu_prompt')
         go_back_text = self.translation_manager.get_translation(context, 'go_back')
 
-        if not user_videos:
+        if not total_videos:
             await update.message.reply_text(no_uploaded_videos_text)
             return await self.show_user_menu(update,context)
 
-        # Store them in context and start at index 0
-        context.user_data['user_videos'] = user_videos
+        # Only the total is stored here; the pairs are loaded window by window
+        # (see _get_video_pair) and start at index 0
+        context.user_data.pop('user_videos', None)
+        self._reset_video_windows(context)
+        context.user_data['user_videos_total'] = total_videos
         context.user_data['current_index'] = 0
         context.user_data.pop('message_ids', None)  # Reset
 
@@ -495,13 +480,13 @@ class UserHandlers:
         - (Optional) View/Hide Feedback button
         Also display upvote/downvote counts for the user's video.
         """
-        user_videos = context.user_data.get('user_videos', [])
+        total_videos = context.user_data.get('user_videos_total', 0)
         current_index = context.user_data.get('current_index', 0)
         
         # --------------------------------------------------------------------------------
         # 1) If the user has no videos
         # --------------------------------------------------------------------------------
-        if not user_videos:
+        if not total_videos:
             # Was hardcoded: "You have no uploaded videos."
             # Now from JSON:
             no_uploaded_videos_text = self.translation_manager.get_translation(context, 'no_uploaded_videos')
@@ -512,15 +497,21 @@ class UserHandlers:
             return  # Possibly return to some menu
         
         # Ensure current_index is within valid range
-        if current_index >= len(user_videos):
-            current_index = len(user_videos) - 1
+        if current_index >= total_videos:
+            current_index = total_videos - 1
             context.user_data['current_index'] = current_index
         elif current_index < 0:
             current_index = 0
             context.user_data['current_index'] = current_index
 
-        # Extract data from the current pair
-        video_pair = user_videos[current_index]
+        # Extract data from the current pair (loads its window if needed)
+        user_id = await self._get_user_id_from_context(context, update)
+        video_pair = await self._get_video_pair(context, user_id, current_index)
+        if video_pair is None:
+            message = update.message if update.message else update.callback_query.message
+            if message:
+                await message.reply_text(self.translation_manager.get_translation(context, 'no_uploaded_videos'))
+            return
         user_video_id = video_pair['user_video_id']
         user_video_path = video_pair['user_video_path']
         translator_video_path = video_pair['translator_video_path']
@@ -577,7 +568,7 @@ class UserHandlers:
                     callback_data="previous_user_video"
                 )
             )
-        if current_index < len(user_videos) - 1:
+        if current_index < total_videos - 1:
             nav_buttons.append(
                 InlineKeyboardButton(
                     self.translation_manager.get_translation(context, 'next_page'),
@@ -618,14 +609,15 @@ class UserHandlers:
                 )
         else:
             if translator_video_path:
-                signed_url = BucketService.view_bucket_video(translator_video_path)
-                if signed_url:
-                    msg = await message.reply_video(
-                        video=signed_url,
-                        caption=translator_caption
-                    )
-                #else error cixart logger.error
-                message_ids['translator'] = msg.message_id
+                msg = await self.media_cache.reply_video(
+                    message,
+                    translator_video_path,
+                    caption=translator_caption
+                )
+                if msg:
+                    message_ids['translator'] = msg.message_id
+                else:
+                    logger.error(f"Could not send translator video {translator_video_path}")
             else:
                 msg = await message.reply_text(translator_not_found)
                 message_ids['translator'] = msg.message_id
@@ -650,13 +642,16 @@ class UserHandlers:
                 )
         else:
             if user_video_path:
-                signed_url = BucketService.view_bucket_video(user_video_path)
-                msg = await message.reply_video(
-                    video=signed_url,
+                msg = await self.media_cache.reply_video(
+                    message,
+                    user_video_path,
                     caption=user_video_caption,
                     reply_markup=markup
                 )
-                message_ids['user'] = msg.message_id
+                if msg:
+                    message_ids['user'] = msg.message_id
+                else:
+                    logger.error(f"Could not send user video {user_video_path}")
             else:
                 msg = await message.reply_text(
                     user_video_not_found,
@@ -674,13 +669,12 @@ class UserHandlers:
         query = update.callback_query
         await query.answer()
 
-        user_videos = context.user_data.get('user_videos', [])
         current_index = context.user_data.get('current_index', 0)
 
         # 1) Hide feedback from current video (if any)
-        if 0 <= current_index < len(user_videos):
-            current_video_id = user_videos[current_index]['user_video_id']
-            await self.hide_feedback_for_video(context, current_video_id, query.message.chat_id)
+        current_pair = self._loaded_video_pair(context, current_index)
+        if current_pair:
+            await self.hide_feedback_for_video(context, current_pair['user_video_id'], query.message.chat_id)
 
         # 2) Now move to the next video
         context.user_data['current_index'] = current_index + 1
@@ -696,13 +690,12 @@ class UserHandlers:
         query = update.callback_query
         await query.answer()
 
-        user_videos = context.user_data.get('user_videos', [])
         current_index = context.user_data.get('current_index', 0)
 
         # Hide old feedback
-        if 0 <= current_index < len(user_videos):
-            current_video_id = user_videos[current_index]['user_video_id']
-            await self.hide_feedback_for_video(context, current_video_id, query.message.chat_id)
+        current_pair = self._loaded_video_pair(context, current_index)
+        if current_pair:
+            await self.hide_feedback_for_video(context, current_pair['user_video_id'], query.message.chat_id)
 
         context.user_data['current_index'] = current_index - 1
 
@@ -726,7 +719,7 @@ class UserHandlers:
             return USER_VIEW_VIDEOS
 
         user_video_id = int(match.group(1))
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         if not user_id:
             bot_restarted_text = self.translation_manager.get_translation(context, 'bot_restarted')
             await query.message.reply_text(bot_restarted_text)
@@ -736,23 +729,21 @@ class UserHandlers:
         await self.hide_feedback_for_video(context, user_video_id, query.message.chat_id)
 
         # 2) Delete from DB
-        self.db_service.delete_user_video(user_video_id, user_id)
-        # 3)bucket elave ele
-
-        # 4) Remove from context's user_videos
-        user_videos = context.user_data.get('user_videos', [])
+        orphaned_path = await self.db_service.delete_user_video(user_video_id, user_id)
+        # 3) Remove the stored object from the bucket once no other video uses it
+        if orphaned_path:
+            await self.video_store.delete(orphaned_path)
+            await self.media_cache.invalidate(orphaned_path)
+
+        # 4) One video less: the loaded windows are shifted, reload them lazily
+        total_videos = max(context.user_data.get('user_videos_total', 1) - 1, 0)
+        context.user_data['user_videos_total'] = total_videos
+        self._reset_video_windows(context)
+
+        # adjust the current_index if needed
         current_index = context.user_data.get('current_index', 0)
-
-        for i, video_pair in enumerate(user_videos):
-            if video_pair['user_video_id'] == user_video_id:
-                user_videos.pop(i)
-                # adjust the current_index if needed
-                if current_index >= len(user_videos):
-                    current_index = len(user_videos) - 1
-                context.user_data['current_index'] = current_index
-                break
-
-        context.user_data['user_videos'] = user_videos
+        if current_index >= total_videos:
+            context.user_data['current_index'] = total_videos - 1
 
         # 4) Delete old messages (the user & translator videos) from chat
         chat_id = update.effective_chat.id
@@ -765,7 +756,7 @@ class UserHandlers:
         context.user_data.pop('message_ids', None)
 
         # 5) If no videos left, show user a "no more videos" message
-        if not user_videos:
+        if not total_videos:
             no_videos_text = self.translation_manager.get_translation(context, 'your_video_not_available')
             start_text = self.translation_manager.get_translation(context, 'start_button')
             await query.message.reply_text(
@@ -798,7 +789,7 @@ class UserHandlers:
             await update.message.reply_text("⚠️ Error")
             return await self.show_translator_menu(update, context)
 
-        user_rank_data, _ = self.db_service.get_user_rank(user_id, user_role)       
+        user_rank_data, _ = await self.db_service.get_user_rank(user_id, user_role)       
 
         user_points, rank = user_rank_data  # Extract only points & rank
 
@@ -822,7 +813,7 @@ class UserHandlers:
     # INTERNAL / HELPER METHODS
     # --------------------------------------------------------------------------
 
-    def _get_user_id_from_context(self, context, update) -> int:
+    async def _get_user_id_from_context(self, context, update) -> int:
         """
         Retrieves user_id from context, or tries to fetch from DB
         via telegram_id if not found. Returns None if not available.
@@ -836,63 +827,114 @@ class UserHandlers:
             if not telegram_id:
                 # Should not happen, but just in case
                 return None
-            (db_user_id, _, _, _) = self.db_service.check_user_exists(telegram_id)
+            (db_user_id, _, _, _, _) = await self.db_service.check_user_exists(telegram_id)
             if db_user_id:
                 context.user_data['user_id'] = db_user_id
                 return db_user_id
         return None
 
-    def _get_next_available_filename(self, update, context, role="user"):
+    async def _get_next_available_filename(self, update, context, role="user"):
         """
-        Generate the next available filename for a user's or translator's
-        uploaded video (like in your original get_next_available_filename).
+        Returns the S3 URL for the next video of this user (or translator),
+        allocated by the database so concurrent uploads never collide.
         """
-        user_id = self._get_user_id_from_context(context, update)
+        user_id = await self._get_user_id_from_context(context, update)
         username = context.user_data.get('username', 'unknown')
+        return await self.db_service.allocate_video_file_path(user_id, username, role)
 
-        if role.lower() == "user":
-            directory = "https://vesilebucket.s3.amazonaws.com/sign-language-videos/User/"
-            prefix = "user_video"
+    @staticmethod
+    def _reset_video_windows(context):
+        """
+        Forgets the loaded and prefetched "my videos" windows.
+        """
+        context.user_data.pop('user_videos_window', None)
+        context.user_data.pop('user_videos_prefetch', None)
 
-            # Ensure the directory exists
+    @staticmethod
+    def _loaded_video_pair(context, index):
+        """
+        The video pair at 'index' if its window is already loaded, else None (no DB access).
+        """
+        window = context.user_data.get('user_videos_window')
+        if window and window['start'] <= index < window['start'] + len(window['items']):
+            return window['items'][index - window['start']]
+        return None
 
-       
-        #check user videos from database, return the file_path of the last video and cahnge the last num of file path and +1
-        #exaple: https://vesilebucket.s3.amazonaws.com/sign-language-videos/Translator/translator_video_2_unknown_2.mp4
-        #if the last number is 2 add one 
-        #updated file path is: 
-        #https://vesilebucket.s3.amazonaws.com/sign-language-videos/Translator/translator_video_2_unknown_3.mp4
-        #if not found make the num 1
-        
-        last_path = self.db_service.get_last_video_file_path(user_id)
-        number = 1
-        
-        if last_path:
-            last_filename = last_path.split("/")[-1]
-            match = re.search(rf"{prefix}_\d+_[^_]+_(\d+)", last_filename)
-            if match:
-                number = int(match.group(1)) + 1
+    async def _get_video_pair(self, context, user_id, index):
+        """
+        Returns the (user video, translator video) pair at 'index' of the user's
+        videos. Only the window of VIDEO_WINDOW_SIZE pairs around it is kept in
+        user_data; it is loaded on demand (or taken from the prefetched one), and
+        the following window is prefetched in the background.
+        """
+        start = index - index % VIDEO_WINDOW_SIZE
+        window = context.user_data.get('user_videos_window')
+        if not window or window['start'] != start:
+            prefetched = context.user_data.pop('user_videos_prefetch', None)
+            if prefetched and prefetched['start'] == start and prefetched['items'] is not None:
+                window = prefetched
+            else:
+                items = await self.db_service.get_user_video_pairs_page(user_id, offset=start, limit=VIDEO_WINDOW_SIZE)
+                window = {'start': start, 'items': items}
+            context.user_data['user_videos_window'] = window
+
+        next_start = start + VIDEO_WINDOW_SIZE
+        prefetched = context.user_data.get('user_videos_prefetch')
+        if next_start < context.user_data.get('user_videos_total', 0) and not (prefetched and prefetched['start'] == next_start):
+            context.application.create_task(self._prefetch_video_window(context, user_id, next_start))
 
-        new_filename = f"{prefix}_{user_id}_{username}_{number}.mp4"
-        return directory + new_filename
+        return self._loaded_video_pair(context, index)
+
+    async def _prefetch_video_window(self, context, user_id, start):
+        """
+        Loads the window starting at 'start' into user_data['user_videos_prefetch'].
+        """
+        # Mark it as requested first, so quick taps don't start a second prefetch
+        context.user_data['user_videos_prefetch'] = {'start': start, 'items': None}
+        items = await self.db_service.get_user_video_pairs_page(user_id, offset=start, limit=VIDEO_WINDOW_SIZE)
+        prefetched = context.user_data.get('user_videos_prefetch')
+        if prefetched and prefetched['start'] == start:
+            prefetched['items'] = items
+
+    async def _next_translator_video(self, update, context, user_language, classroom_id):
+        """
+        Pops the next translator video from the user's prefetch queue in
+        context.user_data['video_queue'], refilling it with VIDEO_QUEUE_SIZE
+        eligible videos when it is empty or stale (a translator uploaded a new
+        video in this language, or the user switched classroom view).
+        Returns (file_path, sentence) or (None, None) if nothing is left.
+        """
+        version = self.db_service.translator_video_versions.get(user_language, 0)
+        queue_key = (user_language, classroom_id, version)
+        queue = context.user_data.get('video_queue')
+
+        if not queue or queue['key'] != queue_key or not queue['items']:
+            user_id = await self._get_user_id_from_context(context, update)
+            # Skipped and just-answered videos are excluded on the server
+            items = await self.db_service.get_translator_video_batch(
+                user_language,
+                user_id,
+                classroom_id=classroom_id,
+                limit=VIDEO_QUEUE_SIZE
+            )
+            queue = {'key': queue_key, 'items': items}
+            context.user_data['video_queue'] = queue
 
+        if not queue['items']:
+            return None, None
 
+        video_id, file_path, sentence = queue['items'].pop()
+        context.user_data['current_translator_video_id'] = video_id
+        return file_path, sentence
 
     async def _edit_video_message(self, context, chat_id, message_id, video_path, caption, markup=None):
         """
         Helper to edit an existing message with a new video (InputMediaVideo).
         """
-        signed_url = BucketService.view_bucket_video(video_path)
-        if not signed_url:
-            logger.error("Either file_Path or Bucket_service went down")
-            return
-        
-        media = InputMediaVideo(media=signed_url, caption=caption)
         try:
-            await context.bot.edit_message_media(
-                chat_id=chat_id,
-                message_id=message_id,
-                media=media,
+            await self.media_cache.edit_video(
+                context.bot, chat_id, message_id, video_path,
+                caption=caption,
                 reply_markup=markup
             )
         except Exception as e:
@@ -931,7 +973,7 @@ class UserHandlers:
 
         # If feedback was not being shown, we need to show it
         if not currently_shown:
-            feedback_list = self.db_service.get_feedback_for_video(video_id)
+            feedback_list = await self.db_service.get_feedback_for_video(video_id)
             if not feedback_list:
                 await query.message.reply_text("No feedback for this video yet.")
                 return
@@ -999,20 +1041,20 @@ class UserHandlers:
 
     async def _update_user_video_keyboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, video_id: int):
         # Get the current index from context, etc.
-        user_videos = context.user_data.get('user_videos', [])
+        total_videos = context.user_data.get('user_videos_total', 0)
         current_index = context.user_data.get('current_index', 0)
-        if current_index >= len(user_videos):
+        if current_index >= total_videos:
             return
 
         # Build the new keyboard based on updated feedback_shown state
-        feedback_exists = self.db_service.check_if_feedback_exists(video_id)
+        feedback_exists = await self.db_service.check_if_feedback_exists(video_id)
         feedback_shown_map = context.user_data.get("feedback_shown", {})
         feedback_shown = feedback_shown_map.get(video_id, False)
 
         nav_buttons = []
         if current_index > 0:
             nav_buttons.append(InlineKeyboardButton("Previous", callback_data="previous_user_video"))
-        if current_index < len(user_videos) - 1:
+        if current_index < total_videos - 1:
             nav_buttons.append(InlineKeyboardButton("Next", callback_data="next_user_video"))
 
         delete_callback_data = f"delete_user_video_{video_id}"
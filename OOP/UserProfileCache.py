@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserProfileCache:
+    def __init__(self, max_entries=10000, ttl=300):
+        """
+        Bounded LRU cache of user profiles keyed by telegram_id, as returned by
+        DatabaseService.check_user_exists:
+        (user_id, username, language, role, joined_classroom).
+
+        :param max_entries: Max number of profiles kept; least recently used are evicted first.
+        :param ttl: Seconds a profile is trusted. Writes made through DatabaseService
+                    invalidate it right away; the TTL bounds staleness from other writers.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # telegram_id -> (profile, expires_at)
+        self._telegram_ids = {}  # user_id -> telegram_id, for invalidation by user_id
+        # Bumped by every invalidation, see generation()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id):
+        """
+        Returns the cached profile tuple for telegram_id, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry:
+                profile, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(telegram_id)
+                    self.hits += 1
+                    return profile
+                self._remove(telegram_id)
+            self.misses += 1
+            return None
+
+    def generation(self):
+        """
+        Token to take before reading a profile from the database and hand to
+        put(). Invalidations bump it, so a profile read before a concurrent
+        update is not cached after that update invalidated it.
+        """
+        return self._generation
+
+    def put(self, telegram_id, profile, generation=None):
+        """
+        Stores the profile of an existing user (profile[0] is the user_id).
+        Nothing is stored if anything was invalidated since 'generation' was taken.
+        Returns True if the profile was stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._remove(telegram_id)
+            self._entries[telegram_id] = (profile, time.monotonic() + self.ttl)
+            self._telegram_ids[profile[0]] = telegram_id
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+            return True
+
+    def invalidate(self, telegram_id):
+        """
+        Forgets the profile of telegram_id.
+        """
+        with self._lock:
+            self._generation += 1
+            self._remove(telegram_id)
+
+    def invalidate_user(self, user_id):
+        """
+        Forgets the profile of the user with this user_id.
+        """
+        with self._lock:
+            self._generation += 1
+            telegram_id = self._telegram_ids.get(user_id)
+            if telegram_id is not None:
+                self._remove(telegram_id)
+
+    def clear(self):
+        """
+        Forgets every profile (e.g. after a change that touches many users).
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._telegram_ids.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters, the hit rate and the current size.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+            }
+
+    def _remove(self, telegram_id):
+        entry = self._entries.pop(telegram_id, None)
+        if entry:
+            self._telegram_ids.pop(entry[0][0], None)
@@ -0,0 +1,367 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Outcome of VideoStore.put. location is where the content lives: the
+# requested location, or an existing object's location when duplicate is True.
+UploadResult = namedtuple('UploadResult', ['file_path', 'content_hash', 'size', 'duplicate'])
+
+
+class VideoStore:
+    def __init__(self, downloader=None, chunk_size=256 * 1024):
+        """
+        Interface of the places videos live in. A location is whatever the
+        'videos' table stores in file_path: an S3 URL, a local path or a
+        memory:// key. Every method is async; blocking I/O runs in worker threads.
+
+        Backends implement _open_writer, iter_chunks, delete, exists,
+        telegram_source and, where they can, presign. put() is shared: it
+        hashes the content while it is written and drops it before commit if
+        it is stored already.
+
+        :param downloader: Callable(telegram_file) returning an async iterator of
+                           chunks (BucketService.iter_telegram_file). Without it a
+                           Telegram file is downloaded into memory first.
+        :param chunk_size: Read size of iter_chunks.
+        """
+        self.downloader = downloader
+        self.chunk_size = chunk_size
+
+    async def put(self, location, chunks, find_duplicate=None):
+        """
+        Stores the content of the async iterator 'chunks' at location.
+
+        :param find_duplicate: optional async callable(content_hash) returning the
+                               location of stored content with that hash, or None.
+                               On a match the write is aborted before it is committed
+                               (the content has been read and sent by then; only
+                               storing it twice is avoided).
+        :return: UploadResult.
+        """
+        writer = await self._open_writer(location)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            async for chunk in chunks:
+                hasher.update(chunk)
+                size += len(chunk)
+                await writer.write(chunk)
+            content_hash = hasher.hexdigest()
+            existing = await find_duplicate(content_hash) if find_duplicate else None
+            if existing and existing != location:
+                await writer.abort()
+                logger.info(f"Upload to {location} is a duplicate of {existing}, not stored again")
+                return UploadResult(existing, content_hash, size, True)
+            await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+        logger.info(f"Stored {location} ({size} bytes)")
+        return UploadResult(location, content_hash, size, False)
+
+    async def put_telegram_file(self, telegram_file, location, find_duplicate=None):
+        """
+        Streams a telegram.File (from bot.get_file()) into the store, see put().
+        """
+        return await self.put(location, self._telegram_chunks(telegram_file), find_duplicate)
+
+    async def _telegram_chunks(self, telegram_file):
+        if self.downloader is not None:
+            async for chunk in self.downloader(telegram_file):
+                yield chunk
+        else:
+            yield bytes(await telegram_file.download_as_bytearray())
+
+    async def _open_writer(self, location):
+        raise NotImplementedError
+
+    async def iter_chunks(self, location):
+        """
+        Async iterator over the stored content, chunk_size bytes at a time.
+        """
+        raise NotImplementedError
+
+    async def delete(self, location):
+        """
+        Removes the content at location. Returns True on success.
+        """
+        raise NotImplementedError
+
+    async def delete_many(self, locations):
+        """
+        Removes the content at every location.
+        Returns {location: error message} for the ones that could not be removed.
+        """
+        failures = {}
+        for location in locations:
+            if not await self.delete(location):
+                failures[location] = 'delete failed'
+        return failures
+
+    async def exists(self, location):
+        raise NotImplementedError
+
+    async def presign(self, location, expiration=3600):
+        """
+        A URL the content can be fetched from without credentials, or None
+        if the backend has no such thing.
+        """
+        return None
+
+    async def telegram_source(self, location):
+        """
+        What to hand to Telegram to send the video: a URL, an open file (the
+        caller closes it) or bytes. None if there is no content at location.
+        """
+        raise NotImplementedError
+
+
+class _S3Writer:
+    def __init__(self, upload):
+        self.upload = upload
+
+    async def write(self, chunk):
+        self.upload.feed(chunk)  # at most one part is buffered
+        if self.upload.has_full_part:
+            await asyncio.to_thread(self.upload.upload_part)
+
+    async def commit(self):
+        await asyncio.to_thread(self.upload.complete)
+
+    async def abort(self):
+        await asyncio.to_thread(self.upload.abort)
+
+
+class S3VideoStore(VideoStore):
+    def __init__(self, bucket_service, **kwargs):
+        """
+        Videos in S3, addressed by their full URL. Writes are multipart
+        uploads holding one part in memory; presigned URLs come from the
+        BucketService URL cache.
+
+        :param bucket_service: The shared BucketService.
+        """
+        kwargs.setdefault('downloader', bucket_service.iter_telegram_file)
+        super().__init__(**kwargs)
+        self.bucket_service = bucket_service
+
+    async def _open_writer(self, location):
+        upload = await asyncio.to_thread(self.bucket_service.start_multipart_upload, location)
+        return _S3Writer(upload)
+
+    async def iter_chunks(self, location):
+        body = await asyncio.to_thread(self.bucket_service.get_object_body, location)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, location):
+        return await asyncio.to_thread(self.bucket_service.removeFromBucket, location)
+
+    async def delete_many(self, locations):
+        # Batched multi-object deletes instead of one request per object
+        return await asyncio.to_thread(self.bucket_service.removeManyFromBucket, list(locations))
+
+    async def exists(self, location):
+        return await asyncio.to_thread(self.bucket_service.object_exists, location)
+
+    async def presign(self, location, expiration=3600):
+        return await asyncio.to_thread(self.bucket_service.view_bucket_video, location, expiration)
+
+    async def telegram_source(self, location):
+        # Telegram fetches the object itself
+        return await self.presign(location)
+
+
+class _LocalWriter:
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.part"
+        self.file = None
+
+    async def write(self, chunk):
+        if self.file is None:
+            self.file = await asyncio.to_thread(open, self.temp_path, 'wb')
+        await asyncio.to_thread(self.file.write, chunk)
+
+    async def commit(self):
+        if self.file is None:
+            self.file = await asyncio.to_thread(open, self.temp_path, 'wb')
+        await asyncio.to_thread(self.file.close)
+        await asyncio.to_thread(os.replace, self.temp_path, self.path)
+
+    async def abort(self):
+        if self.file is not None:
+            await asyncio.to_thread(self.file.close)
+            try:
+                await asyncio.to_thread(os.remove, self.temp_path)
+            except OSError:
+                pass
+
+
+class LocalVideoStore(VideoStore):
+    def __init__(self, **kwargs):
+        """
+        Videos on the local file system, addressed by their path (e.g. the
+        instruction video). Files are written to '<path>.part' and renamed
+        on commit, so readers never see half a video.
+        """
+        super().__init__(**kwargs)
+
+    async def _open_writer(self, location):
+        directory = os.path.dirname(location)
+        if directory:
+            await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        return _LocalWriter(location)
+
+    async def iter_chunks(self, location):
+        f = await asyncio.to_thread(open, location, 'rb')
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, location):
+        try:
+            await asyncio.to_thread(os.remove, location)
+            return True
+        except OSError as e:
+            logger.error(f"Failed to delete {location}: {e}")
+            return False
+
+    async def exists(self, location):
+        return await asyncio.to_thread(os.path.exists, location)
+
+    async def telegram_source(self, location):
+        try:
+            return await asyncio.to_thread(open, location, 'rb')
+        except OSError:
+            return None
+
+
+class _MemoryWriter:
+    def __init__(self, objects, location):
+        self.objects = objects
+        self.location = location
+        self.buffer = bytearray()
+
+    async def write(self, chunk):
+        self.buffer.extend(chunk)
+
+    async def commit(self):
+        self.objects[self.location] = bytes(self.buffer)
+
+    async def abort(self):
+        self.buffer.clear()
+
+
+class MemoryVideoStore(VideoStore):
+    def __init__(self, **kwargs):
+        """
+        Videos kept in a dict, addressed by memory:// locations, for running
+        the bot without S3 (video_store=memory) and for trying out handlers.
+        Nothing survives a restart.
+        """
+        super().__init__(**kwargs)
+        self.objects = {}  # location -> bytes
+
+    async def _open_writer(self, location):
+        return _MemoryWriter(self.objects, location)
+
+    async def iter_chunks(self, location):
+        data = self.objects[location]
+        for start in range(0, len(data), self.chunk_size):
+            yield data[start:start + self.chunk_size]
+
+    async def delete(self, location):
+        return self.objects.pop(location, None) is not None
+
+    async def exists(self, location):
+        return location in self.objects
+
+    async def telegram_source(self, location):
+        return self.objects.get(location)
+
+
+class RoutingVideoStore(VideoStore):
+    def __init__(self, default, routes=()):
+        """
+        Sends every call to the backend responsible for the location: the
+        first route whose prefix matches, else the default backend.
+
+        :param default: VideoStore for locations no route matches.
+        :param routes: Iterable of (location prefix, VideoStore).
+        """
+        super().__init__(chunk_size=default.chunk_size)
+        self.default = default
+        self.routes = tuple(routes)
+
+    @classmethod
+    def from_config(cls, bucket_service, config):
+        """
+        Builds the store selected by the optional video_store key of config.txt:
+
+            video_store=s3      # s3 (URLs in S3, paths on local disk) or memory
+
+        memory keeps uploads in the process (for running without S3): the
+        DatabaseService then allocates memory:// locations for them. Existing
+        S3 URLs still go to S3, and local paths such as the instruction video
+        are still read from disk.
+        """
+        local = LocalVideoStore(downloader=bucket_service.iter_telegram_file)
+        s3 = S3VideoStore(bucket_service)
+        routes = [('http://', s3), ('https://', s3)]
+        if config.get('video_store', 's3').lower() == 'memory':
+            routes.append(('memory://', MemoryVideoStore(downloader=bucket_service.iter_telegram_file)))
+        return cls(local, routes=routes)
+
+    def backend(self, location):
+        for prefix, store in self.routes:
+            if location.startswith(prefix):
+                return store
+        return self.default
+
+    async def put(self, location, chunks, find_duplicate=None):
+        return await self.backend(location).put(location, chunks, find_duplicate)
+
+    async def put_telegram_file(self, telegram_file, location, find_duplicate=None):
+        return await self.backend(location).put_telegram_file(telegram_file, location, find_duplicate)
+
+    async def iter_chunks(self, location):
+        async for chunk in self.backend(location).iter_chunks(location):
+            yield chunk
+
+    async def delete(self, location):
+        return await self.backend(location).delete(location)
+
+    async def delete_many(self, locations):
+        by_backend = {}
+        for location in locations:
+            store = self.backend(location)
+            by_backend.setdefault(id(store), (store, []))[1].append(location)
+        failures = {}
+        for store, store_locations in by_backend.values():
+            failures.update(await store.delete_many(store_locations))
+        return failures
+
+    async def exists(self, location):
+        return await self.backend(location).exists(location)
+
+    async def presign(self, location, expiration=3600):
+        return await self.backend(location).presign(location, expiration)
+
+    async def telegram_source(self, location):
+        return await self.backend(location).telegram_source(location)
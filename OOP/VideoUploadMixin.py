@@ -0,0 +1,63 @@
+from VideoStore import UploadResult
+
+
+class VideoUploadMixin:
+    """
+    Shared upload path of the handler classes. The handler provides
+    db_service, translation_manager, media_cache, video_store and
+    upload_queue (None to upload inline).
+    """
+
+    async def _queue_video_upload(self, context, chat_id, telegram_file, file_path, video_info):
+        """
+        Hands the upload to the background UploadQueue (or runs it inline if there is none).
+        save_video_info runs only after the object exists in S3.
+        Content that is already stored is not stored again. A Telegram file
+        seen before (file_unique_id) is not transferred at all; only this
+        pre-check saves egress. An upload whose SHA-256 matches an existing
+        object has been streamed to S3 already, but is dropped before it is
+        assembled, and so is an identical upload that finished concurrently
+        (save_video_info points its row at the first one). The videos row
+        then points at the existing object.
+        Returns False if the queue is saturated and the upload was not accepted.
+        """
+        async def save(result):
+            if not result.duplicate:
+                # A new object under this key: any file_id sent for an older one is stale
+                await self.media_cache.invalidate(result.file_path)
+            stored_path = await self.db_service.save_video_info(
+                file_path=result.file_path,
+                content_hash=result.content_hash,
+                size_bytes=result.size,
+                file_unique_id=telegram_file.file_unique_id,
+                duplicate=result.duplicate,
+                **video_info
+            )
+            if stored_path and stored_path != result.file_path:
+                # An identical upload registered its object first; ours is unused
+                await self.video_store.delete(result.file_path)
+            return stored_path
+
+        async def on_complete(result):
+            if await save(result) is False:
+                # The object it was deduplicated to was deleted meanwhile: store it after all
+                await save(await self.video_store.put_telegram_file(telegram_file, file_path))
+
+        async def on_failure(error):
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=self.translation_manager.get_translation(context, 'upload_failed')
+            )
+
+        async def find_duplicate(content_hash):
+            existing = await self.db_service.find_video_object(content_hash=content_hash)
+            return existing[0] if existing else None
+
+        existing = await self.db_service.find_video_object(file_unique_id=telegram_file.file_unique_id)
+        if existing and await save(UploadResult(*existing, duplicate=True)) is not False:
+            return True
+
+        if self.upload_queue is None:
+            await on_complete(await self.video_store.put_telegram_file(telegram_file, file_path, find_duplicate))
+            return True
+        return await self.upload_queue.submit(telegram_file, file_path, on_complete, on_failure, find_duplicate)
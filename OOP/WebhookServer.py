@@ -0,0 +1,282 @@
+import asyncio
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    503: 'Service Unavailable',
+}
+
+
+class WebhookServer:
+    def __init__(self, application, host='127.0.0.1', port=8443, path='/telegram', secret_token=None,
+                 max_body_size=1024 * 1024, idle_timeout=30, max_header_lines=100, request_timeout=10,
+                 allow_no_secret=False):
+        """
+        Minimal HTTP/1.1 server that receives Telegram webhook updates and
+        puts them on application.update_queue, from where the Application
+        processes them like polled updates.
+
+        - keep-alive: one connection serves many requests until idle_timeout.
+        - bodies larger than max_body_size are refused with 413.
+        - requests must carry secret_token in the
+          X-Telegram-Bot-Api-Secret-Token header (401 otherwise). Without a
+          secret anyone can inject updates, so the server refuses to start
+          unless allow_no_secret is set (e.g. for local testing).
+        - headers and body must arrive within request_timeout seconds
+          (408 otherwise), so slow clients can't hold connections open.
+        - a body that is not an update (e.g. `null`) is refused with 400.
+        - the update queue should be bounded: when it is full the update is
+          refused with 503 and Telegram delivers it again later.
+        - stop() stops accepting, lets running requests finish, and the
+          Application then drains the queued updates.
+
+        Local test with a recorded update:
+
+            curl -H 'X-Telegram-Bot-Api-Secret-Token: <secret>' \
+                 -H 'Content-Type: application/json' \
+                 --data @update.json http://127.0.0.1:8443/telegram
+
+        :param application: The telegram.ext.Application.
+        :param host: Interface to listen on (put a TLS proxy in front for Telegram).
+        :param port: Port to listen on.
+        :param path: URL path the webhook is registered with.
+        :param secret_token: Expected X-Telegram-Bot-Api-Secret-Token value.
+        :param max_body_size: Max accepted request body in bytes.
+        :param idle_timeout: Seconds a keep-alive connection may stay idle.
+        :param max_header_lines: Max header lines per request.
+        :param request_timeout: Seconds allowed to read the headers, and again the body, of a request.
+        :param allow_no_secret: Run without secret_token (logs a warning instead of refusing).
+        """
+        if not secret_token:
+            if not allow_no_secret:
+                raise ValueError(
+                    "Webhook mode needs a secret token (webhook_secret); "
+                    "set webhook_allow_no_secret=true to run without one"
+                )
+            logger.warning(
+                "Webhook server runs WITHOUT a secret token: anyone who can reach "
+                f"{host}:{port}{path} can inject updates"
+            )
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body_size = max_body_size
+        self.idle_timeout = idle_timeout
+        self.max_header_lines = max_header_lines
+        self.request_timeout = request_timeout
+
+        self._server = None
+        self._connections = set()
+        self._busy = set()  # connections currently handling a request
+
+        # Metrics
+        self.accepted = 0
+        self.rejected_full = 0
+        self.rejected_auth = 0
+        self.rejected_invalid = 0
+        self.rejected_timeout = 0
+
+    @classmethod
+    def from_config(cls, application, config):
+        """
+        Builds a WebhookServer from the optional webhook_* keys of config.txt:
+
+            webhook_listen=127.0.0.1
+            webhook_port=8443
+            webhook_path=/telegram
+            webhook_secret=some-random-string
+            webhook_max_body=1048576
+            webhook_idle_timeout=30
+            webhook_request_timeout=10
+            webhook_allow_no_secret=false   # only for local testing
+        """
+        return cls(
+            application,
+            host=config.get('webhook_listen', '127.0.0.1'),
+            port=int(config.get('webhook_port', 8443)),
+            path=config.get('webhook_path', '/telegram'),
+            secret_token=config.get('webhook_secret') or None,
+            max_body_size=int(config.get('webhook_max_body', 1024 * 1024)),
+            idle_timeout=float(config.get('webhook_idle_timeout', 30)),
+            request_timeout=float(config.get('webhook_request_timeout', 10)),
+            allow_no_secret=config.get('webhook_allow_no_secret', 'false').lower() == 'true'
+        )
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self, drain_timeout=10):
+        """
+        Stops accepting connections, waits up to drain_timeout seconds for
+        requests in progress, then closes the remaining (idle) connections.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while self._busy and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+        logger.info(f"Webhook server stopped. Metrics: {self.metrics()}")
+
+    def metrics(self):
+        return {
+            'accepted': self.accepted,
+            'rejected_full': self.rejected_full,
+            'rejected_auth': self.rejected_auth,
+            'rejected_invalid': self.rejected_invalid,
+            'rejected_timeout': self.rejected_timeout,
+            'connections': len(self._connections),
+            'queue_depth': self.application.update_queue.qsize(),
+        }
+
+    async def _respond(self, writer, status, keep_alive, body=b''):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def _read_headers(self, reader):
+        """
+        Reads the header block. Returns a dict with lower-case names,
+        or None if there were too many header lines.
+        """
+        headers = {}
+        for _ in range(self.max_header_lines):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return None
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    return
+                if not request_line:
+                    return  # client closed
+
+                self._busy.add(writer)
+                try:
+                    keep_alive = await self._handle_request(request_line, reader, writer)
+                finally:
+                    self._busy.discard(writer)
+                if not keep_alive or self._server is None or not self._server.is_serving():
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.debug(f"Webhook connection dropped: {e}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, request_line, reader, writer):
+        """
+        Handles one request. Returns True if the connection can be kept open.
+        """
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            self.rejected_invalid += 1
+            await self._respond(writer, 400, False)
+            return False
+        method, target, version = parts
+
+        try:
+            headers = await asyncio.wait_for(self._read_headers(reader), timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            await self._respond(writer, 408, False)
+            return False
+        if headers is None:
+            self.rejected_invalid += 1
+            await self._respond(writer, 431, False)
+            return False
+
+        connection_header = headers.get('connection', '').lower()
+        keep_alive = connection_header != 'close' if version == 'HTTP/1.1' else connection_header == 'keep-alive'
+
+        length = headers.get('content-length')
+        if length is None or not length.isdigit():
+            self.rejected_invalid += 1
+            await self._respond(writer, 411, False)
+            return False
+        length = int(length)
+        if length > self.max_body_size:
+            # Don't read (or keep) the oversized body
+            self.rejected_invalid += 1
+            await self._respond(writer, 413, False)
+            return False
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            await self._respond(writer, 408, False)
+            return False
+
+        if target.split('?', 1)[0] != self.path:
+            self.rejected_invalid += 1
+            await self._respond(writer, 404, keep_alive)
+            return keep_alive
+        if method != 'POST':
+            self.rejected_invalid += 1
+            await self._respond(writer, 405, keep_alive)
+            return keep_alive
+        # compare_digest only takes ASCII str, so compare bytes: a client
+        # sending non-ASCII must get a 401, not crash the handler
+        if self.secret_token and not hmac.compare_digest(
+            headers.get('x-telegram-bot-api-secret-token', '').encode('latin-1'),
+            self.secret_token.encode('utf-8')
+        ):
+            self.rejected_auth += 1
+            await self._respond(writer, 401, keep_alive)
+            return keep_alive
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.warning(f"Invalid webhook update: {e}")
+            update = None
+        if update is None:
+            # e.g. a body of `null`, for which de_json returns None
+            self.rejected_invalid += 1
+            await self._respond(writer, 400, keep_alive)
+            return keep_alive
+
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected_full += 1
+            await self._respond(writer, 503, keep_alive)
+            return keep_alive
+
+        self.accepted += 1
+        await self._respond(writer, 200, keep_alive)
+        return keep_alive
@@ -3,16 +3,16 @@ from telegram.ext import (
     ContextTypes,
 )
 
-from apscheduler.jobstores.base import JobLookupError
+from TimeoutTracker import TimeoutTracker
 RESTART_JOB_KEY = 'restart_job'
 
+# Shared tracker for the "Bot restarted" fallback (see MainApp.schedule_restarted_message)
+timeout_tracker = TimeoutTracker()
+
 def cancel_restarted_message(context: ContextTypes.DEFAULT_TYPE):
     """
-    Cancels the 'bot restarted' job once a handler actually responds.
+    Cancels the 'bot restarted' timeout once a handler actually responds.
     """
-    old_job = context.user_data.pop(RESTART_JOB_KEY, None)
-    if old_job:
-        try:
-            old_job.schedule_removal()
-        except JobLookupError:
-            pass
\ No newline at end of file
+    timeout_key = context.user_data.pop(RESTART_JOB_KEY, None)
+    if timeout_key is not None:
+        timeout_tracker.cancel(timeout_key)